@@ -0,0 +1,161 @@
+"""End-to-end benchmarks for the login paths, against a local stand-in Prism.
+
+Starts the FakePrismServer of tests/fake_prism.py, points a temporary $HOME at
+it and times:
+
+  - login_utility end to end (cached token + exchange + AWS file write)
+  - get_or_refresh_tokens: cache hit, refresh, full (browserless) login
+  - fetch_available_roles with a large role catalog, uncached and cached
+  - write_aws_credentials into credentials files of 10 to 5,000 profiles
+
+Results are printed (or written with --output) as JSON:
+
+    python benchmarks/bench_login.py --roles 10000 --latency-ms 20 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_common import get_profile_config, normalize_credentials  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+from ck_prism.ck_aws_files import get_aws_credentials_path  # noqa: E402
+
+PROFILE = 'bench'
+
+def follow_redirect(auth_url):
+    """Stand-in for the browser: follow the auth redirect to the callback server."""
+    import requests
+    requests.get(auth_url, timeout=10)
+    return True
+
+def measure(fn, iterations, setup=None):
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+    }
+
+def write_config(home, server):
+    config_dir = os.path.join(home, '.ck-prism')
+    os.makedirs(config_dir, exist_ok=True)
+    config = {PROFILE: server.profile_config()}
+    with open(os.path.join(config_dir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    return config
+
+def bench_tokens(home, profile_config, iterations):
+    token_file = ck_login.get_token_file(profile_config, home)
+
+    def remove_tokens():
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(token_file)
+
+    def expire_tokens():
+        tokens = ck_login.load_tokens(token_file) or ck_login.get_or_refresh_tokens(profile_config, home)
+        tokens['expires_at'] = 0
+        ck_login.save_tokens(token_file, tokens)
+
+    get_tokens = lambda: ck_login.get_or_refresh_tokens(profile_config, home, PROFILE)
+    results = {
+        'full_login': measure(get_tokens, iterations, setup=remove_tokens),
+        'refresh': measure(get_tokens, iterations, setup=expire_tokens),
+    }
+    get_tokens()
+    results['cache_hit'] = measure(get_tokens, iterations * 10)
+    return results
+
+def bench_login_utility(home, iterations):
+    def login():
+        sys.argv = ['ck-prism', 'login', '--profile', PROFILE]
+        ck_login.login_utility()
+    return measure(login, iterations)
+
+def bench_roles(home, profile_config, iterations):
+    access_token = ck_login.get_or_refresh_tokens(profile_config, home)['access_token']
+    ck_login.fetch_available_roles(profile_config, access_token, home, refresh=True)
+    return {
+        'uncached': measure(lambda: ck_login.fetch_available_roles(profile_config, access_token), iterations),
+        'cached': measure(lambda: ck_login.fetch_available_roles(profile_config, access_token, home), iterations),
+    }
+
+def bench_write(home, server, sizes, iterations):
+    creds = normalize_credentials(server.issue_credentials())
+    credentials_path = get_aws_credentials_path(home)
+    results = {}
+    for size in sizes:
+        # Pre-populate the AWS files with `size` profiles, then rewrite one in the middle
+        ck_login.write_aws_credentials_batch([(f'profile-{i}', creds, 'us-east-1') for i in range(size)], home)
+        target = f'profile-{size // 2}'
+        results[str(size)] = measure(
+            lambda: ck_login.write_aws_credentials(server.issue_credentials(), target, home, 'us-east-1'),
+            iterations
+        )
+        os.remove(credentials_path)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency added by the stand-in server')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--roles', type=int, default=10000, help='Roles in the stand-in catalog')
+    parser.add_argument('--profiles', default='10,100,1000,5000',
+                        help='Credentials file sizes for the write benchmark')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix='ck-prism-bench-')
+    os.environ['HOME'] = os.environ['USERPROFILE'] = home
+    ck_login.open_browser = follow_redirect
+
+    server = FakePrismServer(latency=args.latency_ms / 1000.0, error_rate=args.error_rate, role_count=args.roles)
+    with server, open(os.devnull, 'w') as devnull:
+        config = write_config(home, server)
+        profile_config = get_profile_config(config, PROFILE)
+
+        with contextlib.redirect_stdout(devnull):
+            results = {
+                'settings': {
+                    'iterations': args.iterations,
+                    'latency_ms': args.latency_ms,
+                    'error_rate': args.error_rate,
+                    'roles': args.roles,
+                    'python': sys.version.split()[0],
+                },
+                'get_or_refresh_tokens': bench_tokens(home, profile_config, args.iterations),
+                'login_utility': bench_login_utility(home, args.iterations),
+                'fetch_available_roles': bench_roles(home, profile_config, args.iterations),
+                'write_aws_credentials': bench_write(
+                    home, server, [int(size) for size in args.profiles.split(',')], args.iterations
+                ),
+                'server_requests': server.requests,
+            }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Cold-start benchmark for the ck-prism CLI.
+
+Runs `ck-prism help`, `ck-prism status` and a credential-process cache hit in
+fresh interpreters, reports the median wall time above a bare `python -c pass`,
+and exits non-zero when any of them exceeds the budget or imports a heavy
+module on the way.
+
+    python benchmarks/bench_startup.py [--runs 20] [--max-ms 50]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the fast paths must not import
+HEAVY_MODULES = ['requests', 'urllib3', 'http.server', 'socketserver', 'configparser']
+
+RUN_CLI = '''
+import sys, json
+sys.argv = {argv!r}
+from ck_prism.main import main
+main()
+sys.stdout.flush()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+sys.stderr.write(json.dumps(heavy))
+'''
+
+def make_home():
+    """Temporary $HOME with one profile and a valid cached credential."""
+    sys.path.insert(0, ROOT)
+    from ck_prism.ck_common import load_config, get_profile_config
+    from ck_prism.ck_cache import get_credential_cache_file, store_cached_credentials
+
+    home = tempfile.mkdtemp(prefix='ck-prism-bench-')
+    config_dir = os.path.join(home, '.ck-prism')
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, 'config.json'), 'w') as f:
+        json.dump({'bench': {
+            'realm': 'bench',
+            'client_id': 'ckauth-cli',
+            'region': 'us-east-1',
+            'output': 'json',
+            'role_arn': 'arn:aws:iam::123456789012:role/Bench'
+        }}, f)
+
+    profile_config = get_profile_config(load_config(home), 'bench')
+    cache_file = get_credential_cache_file(home, profile_config, profile_config['role_arn'])
+    store_cached_credentials(cache_file, {
+        'expires_at': time.time() + 3600,
+        'credentials': {'Version': 1, 'AccessKeyId': 'AK', 'SecretAccessKey': 'SK', 'SessionToken': 'ST'}
+    })
+    return home
+
+def time_command(args, env, runs):
+    samples = []
+    stderr = ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+        stderr = result.stderr.decode('utf-8')
+    return statistics.median(samples), stderr
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--max-ms', type=float, default=50.0,
+                        help='Allowed startup time above a bare interpreter (default 50)')
+    args = parser.parse_args()
+
+    home = make_home()
+    env = dict(os.environ, HOME=home, USERPROFILE=home, PYTHONPATH=ROOT)
+
+    baseline, _ = time_command([sys.executable, '-c', 'pass'], env, args.runs)
+
+    results = {'baseline_ms': round(baseline, 2), 'max_ms': args.max_ms, 'commands': {}}
+    failed = False
+    for name, argv in [('help', ['ck-prism', 'help']),
+                       ('status', ['ck-prism', 'status']),
+                       ('credential-process-hit', ['ck-prism', 'credential-process', '--profile', 'bench'])]:
+        code = RUN_CLI.format(argv=argv, heavy=HEAVY_MODULES)
+        median, stderr = time_command([sys.executable, '-c', code], env, args.runs)
+        heavy = json.loads(stderr.strip().splitlines()[-1])
+        overhead = median - baseline
+        ok = overhead <= args.max_ms and not heavy
+        failed = failed or not ok
+        results['commands'][name] = {
+            'median_ms': round(median, 2),
+            'overhead_ms': round(overhead, 2),
+            'heavy_imports': heavy,
+            'ok': ok
+        }
+
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
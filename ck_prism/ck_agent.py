@@ -0,0 +1,152 @@
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+import http.server
+import socketserver
+import urllib.parse
+from ck_prism.ck_errors import PrismError
+from ck_prism.ck_client import PrismClient
+from ck_prism.ck_common import (
+    DEFAULT_REFRESH_BEFORE, FALLBACK_CREDENTIAL_LIFETIME, get_home_directory, load_config, add_profile_arguments,
+    select_profiles, format_expiration
+)
+
+# How often the background thread looks for credentials to refresh
+REFRESH_INTERVAL = 30
+
+def agent_utility():
+    directory = get_home_directory()
+
+    parser = argparse.ArgumentParser(prog='ck-prism agent')
+    add_profile_arguments(parser, 'serve')
+    parser.add_argument('--port', type=int, default=0, help='Loopback port to listen on (default: random)')
+    parser.add_argument('--refresh-before', type=int, default=DEFAULT_REFRESH_BEFORE,
+                        help=f'Seconds before expiry to refresh credentials (default {DEFAULT_REFRESH_BEFORE})')
+    args = parser.parse_args(sys.argv[2:])
+
+    config = load_config(directory)
+    profiles = select_profiles(args, config)
+
+    agent = CredentialAgent(config, profiles, directory, args.refresh_before)
+    # Log in up front so the first SDK request never waits on a browser
+    agent.warm_up()
+
+    authorization_token = secrets.token_urlsafe(32)
+    server = start_agent_server(agent, authorization_token, args.port)
+    port = server.server_address[1]
+
+    # A shell holds one AWS_CONTAINER_CREDENTIALS_FULL_URI: export the selected
+    # (or default) profile's, and list the others for switching by hand
+    exported = args.profile or ('default' if 'default' in profiles else profiles[0])
+    print(f'\nck-prism agent listening on http://127.0.0.1:{port}')
+    print(f'\nexport AWS_CONTAINER_AUTHORIZATION_TOKEN={authorization_token}')
+    print(f'export AWS_CONTAINER_CREDENTIALS_FULL_URI={get_profile_url(port, exported)}')
+    others = [profile for profile in profiles if profile != exported]
+    if others:
+        print('# Other profiles served by this agent:')
+        for profile in others:
+            print(f'#   {profile}: AWS_CONTAINER_CREDENTIALS_FULL_URI={get_profile_url(port, profile)}')
+    print('\nPress Ctrl-C to stop.')
+    sys.stdout.flush()
+
+    try:
+        agent.refresh_forever()
+    except KeyboardInterrupt:
+        print('\nStopping ck-prism agent')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def get_profile_url(port, profile):
+    return f'http://127.0.0.1:{port}/profiles/{urllib.parse.quote(profile)}'
+
+class CredentialAgent:
+    """Keeps Prism tokens and AWS credentials for a set of profiles in memory."""
+
+    def __init__(self, config, profiles, directory, refresh_before=DEFAULT_REFRESH_BEFORE):
+        self.directory = directory
+        self.refresh_before = refresh_before
+        self.client = PrismClient(directory=directory, config=config, interactive=True, verbose=True)
+        self.profile_configs = {profile: self.client.profile_config(profile) for profile in profiles}
+
+    def warm_up(self):
+        for profile in self.profile_configs:
+            self.get_credentials(profile)
+
+    def get_credentials(self, profile):
+        """Return ECS-format credentials for a profile, exchanging only when needed."""
+        return self._ecs_credentials(self.client.get_credentials(profile, min_ttl=60))
+
+    def refresh_forever(self):
+        while True:
+            time.sleep(REFRESH_INTERVAL)
+            self.refresh_expiring()
+
+    def refresh_expiring(self):
+        for profile in self.profile_configs:
+            # Jitter spreads refreshes of credentials issued at the same moment
+            min_ttl = self.refresh_before + random.uniform(0, REFRESH_INTERVAL)
+            try:
+                self.client.get_credentials(profile, min_ttl=min_ttl)
+            except PrismError as e:
+                print(f'Background refresh failed for {profile}: {e}')
+
+    def _ecs_credentials(self, credentials):
+        expires_at = credentials.expires_at or time.time() + FALLBACK_CREDENTIAL_LIFETIME
+        return {
+            'AccessKeyId': credentials.access_key_id,
+            'SecretAccessKey': credentials.secret_access_key,
+            'Token': credentials.session_token,
+            'Expiration': format_expiration(expires_at)
+        }
+
+def start_agent_server(agent, authorization_token, port=0):
+    class AgentHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not secrets.compare_digest(self.headers.get('Authorization', ''), authorization_token):
+                self.send_json(401, {'message': 'Invalid authorization token'})
+                return
+
+            parsed = urllib.parse.urlparse(self.path)
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'profiles':
+                self.send_json(404, {'message': 'Not found'})
+                return
+
+            profile = urllib.parse.unquote(parts[1])
+            if profile not in agent.profile_configs:
+                self.send_json(404, {'message': f'Profile {profile} is not served by this agent'})
+                return
+
+            try:
+                credentials = agent.get_credentials(profile)
+            except Exception as e:
+                self.send_json(500, {'message': str(e)})
+                return
+            self.send_json(200, credentials)
+
+        def send_json(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args, **kwargs):
+            pass
+
+    class ThreadingAgentServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    server = ThreadingAgentServer(('127.0.0.1', port), AgentHandler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
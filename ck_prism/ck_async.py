@@ -0,0 +1,111 @@
+import asyncio
+import functools
+import concurrent.futures
+from ck_prism.ck_errors import PrismError
+from ck_prism.ck_client import PrismClient, DEFAULT_MIN_TTL
+
+# Requests to Prism in flight at once, per client
+DEFAULT_MAX_CONCURRENCY = 16
+
+# asyncio.get_running_loop is new in Python 3.7; inside a coroutine,
+# get_event_loop returns the same loop on 3.6
+_get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+class AsyncPrismClient:
+    """asyncio counterpart of PrismClient for scanners that need many credentials at once.
+
+        async with AsyncPrismClient() as client:
+            credentials, errors = await client.get_credentials_for_profiles()
+
+    The blocking HTTP calls of PrismClient run on a private thread pool; at
+    most ``max_concurrency`` of them are in flight. Concurrent awaits for the
+    same realm's tokens or the same role's credentials share one call, and
+    results are cached in memory until they expire, so cache hits never
+    leave the event loop.
+    """
+
+    def __init__(self, profile='default', directory=None, config=None, interactive=False, verbose=False,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.client = PrismClient(profile, directory, config, interactive, verbose)
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+        # Created on first use so that it belongs to the running event loop
+        self._semaphore = None
+        self._pending = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def profiles(self):
+        return self.client.profiles()
+
+    async def get_tokens(self, profile=None):
+        """Prism tokens of the profile's realm, refreshed (once per realm) when needed."""
+        tokens = self.client.cached_tokens(profile)
+        if tokens:
+            return tokens
+        return await self._coalesce(self.client.token_key(profile), self.client.get_tokens, profile)
+
+    async def get_access_token(self, profile=None):
+        return (await self.get_tokens(profile))['access_token']
+
+    async def list_roles(self, profile=None, refresh=False):
+        """RoleIndex of the roles available in the profile's realm."""
+        await self.get_tokens(profile)
+        return await self._run(self.client.list_roles, profile, refresh)
+
+    async def get_credentials(self, profile=None, role_arn=None, min_ttl=DEFAULT_MIN_TTL):
+        """Credentials for the profile's role (or ``role_arn``), exchanged only when needed."""
+        credentials = self.client.cached_credentials(profile, role_arn, min_ttl)
+        if credentials:
+            return credentials
+
+        key = self.client.credential_key(profile, role_arn)
+        # Log in first so that the realm's refresh is shared by all of its roles
+        await self.get_tokens(profile)
+        credentials = await self._coalesce(key, self.client.get_credentials, profile, role_arn, min_ttl)
+        # A shared call may have been made for another profile with the same role
+        return self.client.cached_credentials(profile, role_arn, min_ttl=0) or credentials
+
+    async def get_credentials_for_profiles(self, profiles=None):
+        """Credentials for many profiles (default: all), fetched concurrently.
+
+        Returns ``(credentials, errors)``: dicts of profile name to Credentials
+        and to the PrismError that profile failed with.
+        """
+        profiles = self.profiles() if profiles is None else list(profiles)
+        results = await asyncio.gather(*[self.get_credentials(profile) for profile in profiles],
+                                       return_exceptions=True)
+
+        credentials = {}
+        errors = {}
+        for profile, result in zip(profiles, results):
+            if isinstance(result, PrismError):
+                errors[profile] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                credentials[profile] = result
+        return credentials, errors
+
+    async def _coalesce(self, key, fn, *args):
+        """Await ``fn(*args)`` on the thread pool, sharing one call per key among concurrent awaits."""
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(fn, *args))
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _run(self, fn, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = _get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
@@ -0,0 +1,110 @@
+import os
+import re
+from ck_prism.ck_files import file_lock, atomic_write
+from ck_prism.ck_trace import span
+
+SECTION_RE = re.compile(r'^\s*\[(?P<name>[^\]]+)\]\s*$')
+KEY_RE = re.compile(r'^(?P<key>[^\s=:#;][^=:]*?)\s*[=:]')
+
+def get_aws_credentials_path(directory):
+    return os.path.join(directory, '.aws', 'credentials')
+
+def get_aws_config_path(directory):
+    return os.path.join(directory, '.aws', 'config')
+
+def get_config_section(profile):
+    return f'profile {profile}' if profile != 'default' else profile
+
+def update_ini_file(path, sections):
+    """Set keys in the given sections of an INI file, leaving everything else untouched.
+
+    ``sections`` maps section names to ``{key: value}``. Existing keys are
+    replaced in place, missing keys and sections are appended, and comments,
+    ordering, line endings and keys written by other tools are preserved.
+    The file is patched under an advisory lock and replaced atomically, and
+    is not written at all when nothing changes. Returns True if the file
+    changed. A symlinked file is updated at its target and the link is kept.
+    """
+    path = os.path.realpath(path)
+    with span('write_ini', path=os.path.basename(path)), file_lock(f'{path}.lock'):
+        try:
+            with open(path, 'r', newline='') as f:
+                original = f.read()
+        except FileNotFoundError:
+            original = ''
+
+        updated = patch_ini(original, sections)
+        if updated == original:
+            return False
+
+        atomic_write(path, updated, newline='')
+        return True
+
+def patch_ini(text, sections):
+    """Return ``text`` with ``sections`` applied (see update_ini_file)."""
+    lines = text.splitlines(True)
+    # Added lines use the line ending of the file (CRLF when written on Windows)
+    newline = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += newline
+
+    # Locate [start, end) line ranges of the first occurrence of each section
+    bounds = {}
+    current = None
+    for idx, line in enumerate(lines):
+        match = SECTION_RE.match(line)
+        if match:
+            if current:
+                bounds[current][1] = idx
+            current = match.group('name').strip()
+            if current in bounds:
+                current = None
+                continue
+            bounds[current] = [idx, len(lines)]
+    if current:
+        bounds[current][1] = len(lines)
+
+    # Patch existing sections from the bottom up so earlier ranges stay valid
+    existing = sorted((name for name in sections if name in bounds), key=lambda name: bounds[name][0], reverse=True)
+    for name in existing:
+        start, end = bounds[name]
+        lines[start:end] = _patch_section(lines[start:end], sections[name], newline)
+
+    for name, values in sections.items():
+        if name in bounds:
+            continue
+        if lines and lines[-1].strip():
+            lines.append(newline)
+        lines.append(f'[{name}]{newline}')
+        lines.extend(f'{key} = {value}{newline}' for key, value in values.items())
+
+    return ''.join(lines)
+
+def _patch_section(section_lines, values, newline):
+    pending = dict(values)
+    result = [section_lines[0]]
+    skipping_continuation = False
+
+    for line in section_lines[1:]:
+        if skipping_continuation and line[:1] in (' ', '\t') and line.strip():
+            # Drop continuation lines of a value we replaced
+            continue
+        skipping_continuation = False
+
+        match = KEY_RE.match(line)
+        key = match.group('key').strip().lower() if match else None
+        replacement = next((k for k in pending if k.lower() == key), None) if key else None
+        if replacement is not None:
+            result.append(f'{replacement} = {pending.pop(replacement)}{newline}')
+            skipping_continuation = True
+        else:
+            result.append(line)
+
+    if pending:
+        # Insert after the last non-blank line so blank separators stay at the end
+        insert_at = len(result)
+        while insert_at > 1 and not result[insert_at - 1].strip():
+            insert_at -= 1
+        result[insert_at:insert_at] = [f'{key} = {value}{newline}' for key, value in pending.items()]
+
+    return result
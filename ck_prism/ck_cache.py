@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import hashlib
+from ck_prism.ck_files import atomic_write
+
+# Cached credentials are served until this many seconds before they expire
+CREDENTIAL_CACHE_BUFFER = 300
+# Role catalogs are served from cache for this long before being revalidated
+ROLE_CATALOG_TTL = 3600
+
+def get_credential_cache_dir(directory):
+    return os.path.join(directory, '.ck-prism', 'cache', 'credentials')
+
+def get_credential_cache_file(directory, config, role_arn):
+    """Cache file for a role, keyed by the Prism login URL, realm and role ARN."""
+    key = '|'.join([config.get('keycloak_base_url', ''), config['realm'], role_arn])
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(get_credential_cache_dir(directory), f'{digest}.json')
+
+def get_realm_digest(config):
+    """Stable file-name-safe digest of the Prism login URL and realm."""
+    key = '|'.join([config.get('keycloak_base_url', ''), config['realm']])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def load_cached_credentials(cache_file, buffer=CREDENTIAL_CACHE_BUFFER):
+    """Return cached credentials that stay valid for at least ``buffer`` seconds, else None."""
+    try:
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('expires_at', 0) <= time.time() + buffer:
+        return None
+    return cached
+
+def store_cached_credentials(cache_file, credentials):
+    _write_json(cache_file, credentials)
+
+def get_role_catalog_file(directory, config):
+    return os.path.join(directory, '.ck-prism', 'cache', 'roles', f'{get_realm_digest(config)}.json')
+
+def load_role_catalog(cache_file):
+    """Return the cached role catalog (roles, account_names, etag, fetched_at) or None."""
+    try:
+        with open(cache_file, 'r') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(catalog, dict) or 'roles' not in catalog:
+        return None
+    catalog.setdefault('account_names', {})
+    catalog.setdefault('fetched_at', 0)
+    return catalog
+
+def store_role_catalog(cache_file, catalog):
+    _write_json(cache_file, catalog)
+
+def _write_json(path, data):
+    atomic_write(path, json.dumps(data))
@@ -0,0 +1,133 @@
+import threading
+import http.server
+import socketserver
+import urllib.parse
+
+# Loopback server that receives the browser redirects of interactive logins.
+# One server is shared by every login in progress, so a multi-realm login can
+# have several browser tabs open at once; each redirect is routed to the login
+# waiting on its OAuth ``state``.
+
+# A short poll interval lets shutdown() return promptly once the codes are in
+POLL_INTERVAL = 0.05
+
+# Errors of a silent (prompt=none) authorization that a full login can fix
+SILENT_LOGIN_ERRORS = frozenset(['login_required', 'interaction_required', 'consent_required',
+                                 'account_selection_required'])
+
+_shared = None
+_shared_users = 0
+_shared_lock = threading.Lock()
+
+class CallbackServer:
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        callbacks = self
+
+        class CallbackHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                if parsed.path != '/cb':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                params = urllib.parse.parse_qs(parsed.query)
+                code = params.get('code', [None])[0]
+                state = params.get('state', [None])[0]
+                error = params.get('error', [None])[0]
+
+                if not callbacks.deliver(state, code, error):
+                    self.send_page(400, 'Unknown or expired login', 'Start the login again from ck-prism.')
+                elif error in SILENT_LOGIN_ERRORS:
+                    self.send_page(200, 'Sign-in required', 'ck-prism is opening the login page. You can close this tab.')
+                elif error:
+                    self.send_page(400, 'Authentication failed', error)
+                elif not code:
+                    self.send_page(400, 'Authentication failed', 'The redirect carried no authorization code.')
+                else:
+                    self.send_page(200, 'Login complete!', 'You can close this tab.')
+
+            def send_page(self, status, title, message):
+                body = f'<html><body><h3>{title}</h3><p>{message}</p></body></html>'.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args, **kwargs):
+                pass
+
+        class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = ThreadingServer(('127.0.0.1', 0), CallbackHandler)
+        self.port = self._server.server_address[1]
+        self.redirect_uri = f'http://127.0.0.1:{self.port}/cb'
+
+        thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': POLL_INTERVAL}, daemon=True)
+        thread.start()
+
+    def register(self, state):
+        """Start waiting for the redirect of ``state``; returns the result the handler fills in."""
+        result = {'code': None, 'error': None, 'cancelled': False, 'done': threading.Event()}
+        with self._lock:
+            self._pending[state] = result
+        return result
+
+    def unregister(self, state):
+        with self._lock:
+            self._pending.pop(state, None)
+
+    def deliver(self, state, code, error=None):
+        """Hand a redirect to the login waiting on ``state``. False when no login is."""
+        with self._lock:
+            result = self._pending.pop(state, None) if state else None
+        if result is None:
+            return False
+        result['code'] = None if error else code
+        result['error'] = error or (None if code else 'Missing authorization code')
+        result['done'].set()
+        return True
+
+    def cancel_all(self, error):
+        """Fail every login still waiting, e.g. on Ctrl-C."""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for result in pending:
+            result['error'] = error
+            result['cancelled'] = True
+            result['done'].set()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def acquire_callback_server():
+    """Return the shared callback server, starting it for the first login."""
+    global _shared, _shared_users
+    with _shared_lock:
+        if _shared is None:
+            _shared = CallbackServer()
+        _shared_users += 1
+        return _shared
+
+def release_callback_server():
+    """Stop the shared callback server once the last login is done with it."""
+    global _shared, _shared_users
+    with _shared_lock:
+        _shared_users -= 1
+        if _shared_users > 0 or _shared is None:
+            return
+        server, _shared = _shared, None
+    server.close()
+
+def cancel_pending_logins(error='cancelled'):
+    with _shared_lock:
+        server = _shared
+    if server:
+        server.cancel_all(error)
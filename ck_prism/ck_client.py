@@ -0,0 +1,221 @@
+import time
+import functools
+import concurrent.futures
+from ck_prism import ck_login
+from ck_prism.ck_errors import PrismError
+from ck_prism.ck_roles import RoleIndex
+from ck_prism.ck_singleflight import SingleFlight
+from ck_prism.ck_common import (
+    FALLBACK_CREDENTIAL_LIFETIME, get_home_directory, load_config, get_profile_config, normalize_credentials,
+    parse_expiration, format_expiration, progress_enabled
+)
+
+# Cached credentials are returned until this many seconds before they expire
+DEFAULT_MIN_TTL = 300
+
+def _with_progress(method):
+    """Print ck-prism's progress messages during ``method`` only when the client is verbose."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with progress_enabled(self.verbose):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class Credentials:
+    """AWS credentials of a profile, as returned by PrismClient.get_credentials."""
+
+    __slots__ = ('profile', 'role_arn', 'region', 'access_key_id', 'secret_access_key', 'session_token', 'expires_at')
+
+    def __init__(self, profile, role_arn, region, access_key_id, secret_access_key, session_token, expires_at=None):
+        self.profile = profile
+        self.role_arn = role_arn
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.session_token = session_token
+        # Epoch seconds, or None when Prism did not report an expiration
+        self.expires_at = expires_at
+
+    @property
+    def expiration(self):
+        """Expiration as an ISO 8601 UTC string, or None."""
+        if self.expires_at is None:
+            return None
+        return format_expiration(self.expires_at)
+
+    def as_env(self):
+        """Environment variables understood by the AWS CLI and SDKs."""
+        env = {
+            'AWS_ACCESS_KEY_ID': self.access_key_id,
+            'AWS_SECRET_ACCESS_KEY': self.secret_access_key,
+            'AWS_SESSION_TOKEN': self.session_token,
+            'AWS_REGION': self.region,
+            'AWS_DEFAULT_REGION': self.region
+        }
+        if self.expires_at is not None:
+            env['AWS_CREDENTIAL_EXPIRATION'] = self.expiration
+        return env
+
+    def as_process_output(self):
+        """The document printed by an AWS ``credential_process``."""
+        output = {
+            'Version': 1,
+            'AccessKeyId': self.access_key_id,
+            'SecretAccessKey': self.secret_access_key,
+            'SessionToken': self.session_token
+        }
+        if self.expires_at is not None:
+            output['Expiration'] = self.expiration
+        return output
+
+    def __repr__(self):
+        return f'Credentials(profile={self.profile!r}, access_key_id={self.access_key_id!r}, expiration={self.expiration!r})'
+
+class PrismClient:
+    """In-process access to Prism tokens, role catalogs and AWS credentials.
+
+        client = PrismClient(profile='production')
+        credentials = client.get_credentials()
+        boto3.Session(aws_access_key_id=credentials.access_key_id, ...)
+
+    Methods raise PrismError subclasses (see ck_errors) instead of printing
+    and exiting. Tokens and credentials are kept in memory across calls and
+    concurrent calls for the same realm or role share one request; HTTP
+    connections are pooled per host by ck_http. Tokens are also read from
+    and saved to ~/.ck-prism/tokens like the CLI does, so a client reuses
+    the session of an earlier ``ck-prism login``.
+
+    With ``interactive=False`` (the default) a realm without a usable session
+    raises LoginRequiredError instead of opening a browser. Unless
+    ``verbose`` is set, ck-prism's progress messages are silenced during
+    this client's calls; other clients and the CLI are not affected.
+    """
+
+    def __init__(self, profile='default', directory=None, config=None, interactive=False, verbose=False):
+        self.profile = profile
+        self.directory = directory or get_home_directory()
+        self.interactive = interactive
+        self.verbose = verbose
+        self._config = config
+        self._tokens = {}
+        self._credentials = {}
+        self._inflight = SingleFlight()
+
+    @property
+    def config(self):
+        """Configured profiles, loaded on first use."""
+        if self._config is None:
+            self._config = load_config(self.directory)
+        return self._config
+
+    def profiles(self):
+        return list(self.config)
+
+    def profile_config(self, profile=None):
+        """Settings of a profile with its endpoints resolved; raises ConfigurationError."""
+        return get_profile_config(self.config, profile or self.profile)
+
+    @_with_progress
+    def get_tokens(self, profile=None):
+        """Prism tokens of the profile's realm: cached, refreshed, or from a browser login."""
+        profile = profile or self.profile
+        profile_config = self.profile_config(profile)
+        key = self.token_key(profile)
+
+        tokens = self.cached_tokens(profile)
+        if tokens:
+            return tokens
+
+        def load():
+            tokens = ck_login.get_or_refresh_tokens(profile_config, self.directory, profile, self.interactive)
+            self._tokens[key] = tokens
+            return tokens
+
+        return self._inflight.do(key, load)
+
+    def get_access_token(self, profile=None):
+        return self.get_tokens(profile)['access_token']
+
+    @_with_progress
+    def list_roles(self, profile=None, refresh=False):
+        """RoleIndex of the roles available in the profile's realm."""
+        profile_config = self.profile_config(profile)
+        roles, account_names = ck_login.fetch_available_roles(
+            profile_config, self.get_access_token(profile), self.directory, refresh)
+        return RoleIndex(roles, account_names)
+
+    @_with_progress
+    def get_credentials(self, profile=None, role_arn=None, min_ttl=DEFAULT_MIN_TTL):
+        """Credentials for the profile's role (or ``role_arn`` in the same realm).
+
+        Credentials in memory are reused while they stay valid for ``min_ttl``
+        seconds; otherwise a new set is exchanged.
+        """
+        profile = profile or self.profile
+        profile_config = self.profile_config(profile)
+        role_arn = role_arn or profile_config['role_arn']
+        key = self.credential_key(profile, role_arn)
+
+        credentials = self.cached_credentials(profile, role_arn, min_ttl)
+        if credentials:
+            return credentials
+        entry = self._inflight.do(key, lambda: self._exchange(profile, profile_config, role_arn, key))
+        return Credentials(profile, role_arn, profile_config['region'], *entry['values'])
+
+    def cached_tokens(self, profile=None):
+        """Tokens of the profile's realm held in memory and still valid, else None."""
+        tokens = self._tokens.get(self.token_key(profile))
+        return tokens if ck_login.tokens_are_valid(tokens) else None
+
+    def cached_credentials(self, profile=None, role_arn=None, min_ttl=DEFAULT_MIN_TTL):
+        """Credentials held in memory that stay valid for ``min_ttl`` seconds, else None."""
+        profile = profile or self.profile
+        profile_config = self.profile_config(profile)
+        role_arn = role_arn or profile_config['role_arn']
+
+        entry = self._credentials.get(self.credential_key(profile, role_arn))
+        if not entry or entry['cache_until'] <= time.time() + min_ttl:
+            return None
+        return Credentials(profile, role_arn, profile_config['region'], *entry['values'])
+
+    def get_credentials_for_profiles(self, profiles=None, max_workers=ck_login.DEFAULT_MAX_WORKERS):
+        """Credentials for many profiles (default: all), exchanged concurrently.
+
+        Returns ``(credentials, errors)``: dicts of profile name to Credentials
+        and to the PrismError that profile failed with.
+        """
+        profiles = self.profiles() if profiles is None else list(profiles)
+        credentials = {}
+        errors = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(self.get_credentials, profile): profile for profile in profiles}
+            for future in concurrent.futures.as_completed(futures):
+                profile = futures[future]
+                try:
+                    credentials[profile] = future.result()
+                except PrismError as e:
+                    errors[profile] = e
+        return credentials, errors
+
+    def token_key(self, profile=None):
+        """Hashable key of the session a profile uses; profiles of one realm and client share it."""
+        profile_config = self.profile_config(profile)
+        return ('tokens', profile_config['keycloak_base_url'], profile_config['realm'], profile_config['client_id'])
+
+    def credential_key(self, profile=None, role_arn=None):
+        """Hashable key of the credentials for the profile's role (or ``role_arn``) in its realm."""
+        profile_config = self.profile_config(profile)
+        return ('credentials', profile_config['keycloak_base_url'], profile_config['realm'],
+                role_arn or profile_config['role_arn'])
+
+    def _exchange(self, profile, profile_config, role_arn, key):
+        creds = ck_login.exchange_credentials(profile_config, self.get_access_token(profile), role_arn)
+        access_key, secret_key, session_token, expiration = normalize_credentials(creds)
+        expires_at = parse_expiration(expiration)
+
+        entry = {
+            'values': (access_key, secret_key, session_token, expires_at),
+            'cache_until': expires_at or time.time() + FALLBACK_CREDENTIAL_LIFETIME
+        }
+        self._credentials[key] = entry
+        return entry
@@ -0,0 +1,159 @@
+import os
+import time
+import datetime
+import threading
+import contextlib
+from ck_prism.ck_trace import traced
+from ck_prism.ck_errors import ConfigurationError, ApiError
+
+# Lightweight helpers shared by every command. This module must not import
+# requests or other heavy modules: it is on the startup path of commands
+# that answer from local state, such as cache hits of credential-process.
+
+# Default domain configuration
+DEFAULT_PRISM_DOMAIN = 'prism.cloudkeeper.com'
+
+# Long-running commands refresh credentials this many seconds before they expire
+DEFAULT_REFRESH_BEFORE = 600
+# Lifetime assumed when the exchange does not return an Expiration; the
+# shortest session AWS issues, so credentials are never trusted for too long
+FALLBACK_CREDENTIAL_LIFETIME = 900
+
+def get_prism_base_url(prism_domain=DEFAULT_PRISM_DOMAIN):
+    """Get the login base URL for the given Prism domain."""
+    return f'https://login.{prism_domain}'
+
+def get_api_endpoint(prism_domain=DEFAULT_PRISM_DOMAIN):
+    """Get the API endpoint for the given Prism domain."""
+    return f'https://cli.{prism_domain}/exchange'
+
+# Progress messages ("Refreshing tokens...") are printed by the CLI and
+# silenced by library callers, per thread with progress_enabled
+_progress_local = threading.local()
+
+@contextlib.contextmanager
+def progress_enabled(enabled):
+    """Turn progress messages on or off in the current thread for the duration of the block."""
+    previous = getattr(_progress_local, 'enabled', True)
+    _progress_local.enabled = enabled
+    try:
+        yield
+    finally:
+        _progress_local.enabled = previous
+
+def progress(message):
+    if getattr(_progress_local, 'enabled', True):
+        print(message)
+
+@traced('home_directory')
+def get_home_directory():
+    """Resolve the user's home directory ($HOME, or %USERPROFILE% on Windows)."""
+    return os.path.expanduser('~')
+
+@traced('load_config')
+def load_config(directory):
+    """Load the configured profiles, raising ConfigurationError when there are none or the file is invalid.
+
+    Returns a dict for the JSON store and a lazily loaded mapping for the
+    SQLite store; see ck_store.
+    """
+    from ck_prism.ck_store import get_store
+
+    config = get_store(directory).profiles()
+    if config is None:
+        raise ConfigurationError('Configuration not found. Run ck-prism configure')
+    return config
+
+def get_profile_config(config, profile):
+    """Return the settings of a profile with its Prism endpoints resolved."""
+    if not config or profile not in config:
+        if profile == 'default':
+            raise ConfigurationError('No configuration found. Run ck-prism configure')
+        raise ConfigurationError(f'Profile {profile} not found. Run ck-prism configure')
+
+    profile_config = dict(config[profile])
+
+    # Get Prism domain from config (with default). Explicit endpoints in the
+    # profile take precedence, e.g. for local stand-in servers.
+    prism_domain = profile_config.get('prism_domain', DEFAULT_PRISM_DOMAIN)
+    profile_config.setdefault('keycloak_base_url', get_prism_base_url(prism_domain))
+    profile_config.setdefault('api_endpoint', get_api_endpoint(prism_domain))
+
+    if 'role_arn' not in profile_config:
+        raise ConfigurationError(f"Error: Profile '{profile}' is missing 'role_arn'. Please run 'ck-prism configure' again.")
+
+    return profile_config
+
+def add_profile_arguments(parser, action, default=None):
+    """Add the mutually exclusive --profile, --profiles and --all options.
+
+    ``action`` completes the help texts ("Profile to {action}"). ``default``
+    is the profile used when none is given; None means every profile.
+    """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--profile', default=default, help=f'Profile to {action}')
+    group.add_argument('--profiles', help=f'Comma separated list of profiles to {action}')
+    group.add_argument('--all', action='store_true',
+                       help='Every configured profile' + (' (default)' if default is None else ''))
+
+def select_profiles(args, config):
+    """Profile names chosen with the options of add_profile_arguments."""
+    if args.all:
+        return list(config)
+    if args.profiles:
+        return [p.strip() for p in args.profiles.split(',') if p.strip()]
+    if args.profile:
+        return [args.profile]
+    return list(config)
+
+def normalize_credentials(creds):
+    """Extract the key id, secret, session token and expiration from an exchange response."""
+    # Handle nested credentials structure
+    if 'credentials' in creds:
+        creds = creds['credentials']
+    
+    # Handle both snake_case and PascalCase key formats
+    access_key = creds.get('access_key_id') or creds.get('AccessKeyId')
+    secret_key = creds.get('secret_access_key') or creds.get('SecretAccessKey')
+    session_token = creds.get('session_token') or creds.get('SessionToken')
+    expiration = creds.get('expiration') or creds.get('Expiration')
+    
+    if not access_key or not secret_key or not session_token:
+        raise ApiError(f'Error: Invalid credentials format received (fields: {", ".join(sorted(creds))})')
+
+    return access_key, secret_key, session_token, expiration
+
+def parse_expiration(expiration):
+    """Convert an exchange ``Expiration`` (ISO 8601 string or epoch) to epoch seconds.
+
+    Returns None when the value is missing or cannot be parsed.
+    """
+    if expiration is None or expiration == '':
+        return None
+    if isinstance(expiration, (int, float)):
+        # Some backends return epoch milliseconds
+        return expiration / 1000.0 if expiration > 1e11 else float(expiration)
+
+    value = str(expiration).strip().replace(' ', 'T')
+    try:
+        return parse_expiration(float(value))
+    except ValueError:
+        pass
+
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    if len(value) > 6 and value[-6] in '+-' and value[-3] == ':':
+        value = value[:-3] + value[-2:]
+    elif len(value) == 19:
+        value += '+0000'
+
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z'):
+        try:
+            return datetime.datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+def format_expiration(expires_at):
+    """Format epoch seconds as the ``Expiration`` timestamp AWS SDKs expect."""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(expires_at))
@@ -1,181 +1,366 @@
+import re
 import sys
 import json
-import subprocess
-import os
-from ck_prism.ck_login import interactive_login, fetch_available_roles, DEFAULT_PRISM_DOMAIN, get_prism_base_url, get_api_endpoint
+import argparse
+from ck_prism.ck_common import DEFAULT_PRISM_DOMAIN, get_prism_base_url, get_api_endpoint, get_home_directory, load_config
+from ck_prism.ck_trace import span
+from ck_prism.ck_store import get_store
+from ck_prism.ck_roles import RoleIndex
+from ck_prism.ck_login import get_or_refresh_tokens, fetch_available_roles, record_profile_tokens
+
+DEFAULT_REGION = 'us-east-1'
+# Profile names of --all-roles; fields are {account}, {account_name}, {role} and {realm}
+DEFAULT_NAME_TEMPLATE = '{account}-{role}'
+# Entries shown per page by the account and role pickers
+PAGE_SIZE = 20
 
 def configure_utility():
-    if sys.platform.startswith('linux') or sys.platform.startswith('darwin'):
-        cmd = 'echo $HOME'
-    elif sys.platform.startswith('win'):
-        cmd = 'echo %USERPROFILE%'
-    else:
-        print(f'Unsupported platform: {sys.platform}')
-        exit(1)
+    directory = get_home_directory()
 
-    directory = subprocess.run(cmd, shell=True, capture_output=True)
-    directory = directory.stdout.decode('utf-8').strip()
+    parser = argparse.ArgumentParser(prog='ck-prism configure')
+    parser.add_argument('--refresh-roles', action='store_true',
+                        help='Download the role catalog even if a cached copy is still fresh')
+    parser.add_argument('--prism-domain', help='Prism domain (skips the prompt)')
+    parser.add_argument('--realm', help='Prism tenant (skips the prompt)')
+    parser.add_argument('--profile', help='Name of the profile to create (skips the prompt)')
+    parser.add_argument('--region', help=f'AWS region of generated profiles (default {DEFAULT_REGION})')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--from', dest='manifest', metavar='MANIFEST', help='Create the profiles listed in a JSON manifest')
+    mode.add_argument('--all-roles', action='store_true', help='Create a profile for every available role')
+    mode.add_argument('--sync', action='store_true',
+                      help='Add and remove generated profiles to match the roles currently available')
+    parser.add_argument('--name-template', help=f'Profile name template for --all-roles, or of more profiles added by --sync (default {DEFAULT_NAME_TEMPLATE})')
+    parser.add_argument('--dry-run', action='store_true', help='Show the changes without saving them')
+    args = parser.parse_args(sys.argv[2:])
+
+    if args.profile and (args.manifest or args.all_roles or args.sync):
+        parser.error('--profile names the profile of an interactive configure; bulk profiles are named by --name-template')
+    if args.manifest:
+        configure_from_manifest(directory, args)
+        return
+    if args.sync:
+        sync_profiles(directory, args)
+        return
 
     print("\nConfiguring ck-prism")
     print("=" * 50)
 
     # 1. Ask for Prism Domain
     
-    prism_domain = input(f'\nEnter Prism domain [example - {DEFAULT_PRISM_DOMAIN}]: ').strip() or DEFAULT_PRISM_DOMAIN
+    prism_domain = args.prism_domain or input(f'\nEnter Prism domain [example - {DEFAULT_PRISM_DOMAIN}]: ').strip() or DEFAULT_PRISM_DOMAIN
 
     print(f"Using Prism domain: {prism_domain}")
 
     # 2. Ask for Realm
-    realm = input(f'Enter Prism tenant [example - for sso.{prism_domain}, enter \'sso\']: ').strip() or 'sso'
+    realm = args.realm or input(f'Enter Prism tenant [example - for sso.{prism_domain}, enter \'sso\']: ').strip() or 'sso'
     realm = realm.strip("'")
+    temp_config, roles, account_names = fetch_realm_roles(prism_domain, realm, directory, args.refresh_roles)
+
+    if not roles:
+        print("No roles found for this user.")
+        exit(1)
+        
+    # 4. Index Roles by Account
+    index = RoleIndex(roles, account_names)
+
+    if not index:
+        print("Could not parse any roles.")
+        exit(1)
+
+    if args.all_roles:
+        configure_all_roles(directory, temp_config, index, args)
+        return
+
+    # 5. Prompt for Account
+    selected_account_id = pick('Available Accounts', index.search_accounts, index.describe_account, 'an account')
+
+    # 6. Prompt for Role
+    selected_role = pick(f'Available Roles for Account {selected_account_id}',
+                         lambda query: index.search_roles(selected_account_id, query),
+                         lambda role: role.name, 'a role')
+
+    print(f"\nSelected Role: {selected_role.name} ({selected_role.role_arn})")
+
+    # 7. Ask for Profile Name
+    default_profile_name = f"{selected_account_id}-{selected_role.name}"
+    profile_name = args.profile or input(f'\nEnter Profile Name [{default_profile_name}]: ').strip() or default_profile_name
+    
+    # Ask for Region
+    region = input('Enter AWS Region [us-east-1]: ').strip() or 'us-east-1'
+
+    # 8. Save Configuration
+    with span('save_config'):
+        get_store(directory).save_profiles({
+            profile_name: build_profile(temp_config, selected_role, region)
+        })
+
+    record_profile_tokens(directory, {profile_name: temp_config})
+
+    print(f"\nConfiguration saved for profile '{profile_name}'!")
+    print(f"You can now login using: ck-prism login --profile {profile_name}")
+
+def fetch_realm_roles(prism_domain, realm, directory, refresh=False):
+    """Log in to a realm and return ``(temp_config, roles, account_names)``."""
     # 3. Perform Login
     print(f"\nLogging in to realm '{realm}' to fetch available roles...")
     temp_config = {
+        'prism_domain': prism_domain,
         'realm': realm,
         'client_id': 'ckauth-cli', # Default client ID
         'keycloak_base_url': get_prism_base_url(prism_domain),
         'api_endpoint': get_api_endpoint(prism_domain)
     }
     
-    tokens = interactive_login(temp_config)
+    # Reuses the session of any profile already configured for this tenant
+    tokens = get_or_refresh_tokens(temp_config, directory)
     access_token = tokens['access_token']
     
     # 3. Fetch Roles
     print("\nFetching available roles...")
-    roles, account_names = fetch_available_roles(temp_config, access_token)
-    
-    if not roles:
-        print("No roles found for this user.")
-        exit(1)
-        
-    # 4. Group Roles by Account
-    accounts = {}
-    for role in roles:
-        # Parse role ARN format: {role_arn},{idp_arn} or just {role_arn}
-        if isinstance(role, str):
-            full_arn = role
-            role_arn = role.split(',')[0]
-        elif isinstance(role, dict):
-            full_arn = role.get('role_arn', role.get('arn', str(role)))
-            role_arn = full_arn.split(',')[0] if ',' in full_arn else full_arn
-        else:
-            full_arn = str(role)
-            role_arn = full_arn.split(',')[0]
-            
-        # Extract Account ID (4th component in ARN: arn:aws:iam::ACCOUNT_ID:role/ROLE_NAME)
-        try:
-            parts = role_arn.split(':')
-            if len(parts) >= 5:
-                account_id = parts[4]
-                role_name = parts[5].replace('role/', '')
-                
-                if account_id not in accounts:
-                    accounts[account_id] = []
-                
-                accounts[account_id].append({
-                    'name': role_name,
-                    'full_arn': full_arn,
-                    'role_arn': role_arn
-                })
-        except Exception:
-            continue
+    roles, account_names = fetch_available_roles(temp_config, access_token, directory, refresh=refresh)
+    return temp_config, roles, account_names
 
-    if not accounts:
-        print("Could not parse any roles.")
-        exit(1)
-
-    # 5. Prompt for Account
-    print(f"\nAvailable Accounts: {len(accounts)}")
-    sorted_accounts = sorted(accounts.keys())
-    
-    for idx, acc_id in enumerate(sorted_accounts, 1):
-        acc_name = account_names.get(acc_id) if 'account_names' in locals() else None
-        if acc_name:
-            print(f"{idx}. {acc_id} ({acc_name})")
-        else:
-            print(f"{idx}. {acc_id}")
-        
+def pick(title, search, describe, noun):
+    """Paged picker. A number selects an entry; other input (or /TEXT) filters the list."""
+    query = ''
+    page = 0
     while True:
-        try:
-            selection = input('\nSelect an account (enter number): ').strip()
-            selected_idx = int(selection) - 1
-            if 0 <= selected_idx < len(sorted_accounts):
-                selected_account_id = sorted_accounts[selected_idx]
-                break
-            else:
-                print(f'Please enter a number between 1 and {len(sorted_accounts)}')
-        except ValueError:
-            print('Please enter a valid number')
-        except KeyboardInterrupt:
-            print('\nOperation cancelled')
-            exit(0)
+        matches = search(query)
+        pages = max(1, -(-len(matches) // PAGE_SIZE))
+        page %= pages
+
+        suffix = f" matching '{query}'" if query else ''
+        print(f"\n{title}: {len(matches)}{suffix}")
+        for idx in range(page * PAGE_SIZE, min(len(matches), (page + 1) * PAGE_SIZE)):
+            print(f"{idx + 1}. {describe(matches[idx])}")
+        if pages > 1:
+            print(f"Page {page + 1}/{pages}. Press Enter for the next page, or type to filter.")
 
-    # 6. Prompt for Role
-    account_roles = accounts[selected_account_id]
-    print(f"\nAvailable Roles for Account {selected_account_id}:")
-    
-    for idx, role in enumerate(account_roles, 1):
-        print(f"{idx}. {role['name']}")
-        
-    while True:
         try:
-            selection = input('\nSelect a role (enter number): ').strip()
-            selected_idx = int(selection) - 1
-            if 0 <= selected_idx < len(account_roles):
-                selected_role = account_roles[selected_idx]
-                break
-            else:
-                print(f'Please enter a number between 1 and {len(account_roles)}')
-        except ValueError:
-            print('Please enter a valid number')
+            selection = input(f'\nSelect {noun} (enter number): ').strip()
         except KeyboardInterrupt:
             print('\nOperation cancelled')
             exit(0)
-            
-    print(f"\nSelected Role: {selected_role['name']} ({selected_role['role_arn']})")
 
-    # 7. Ask for Profile Name
-    default_profile_name = f"{selected_account_id}-{selected_role['name']}"
-    profile_name = input(f'\nEnter Profile Name [{default_profile_name}]: ').strip() or default_profile_name
-    
-    # Ask for Region
-    region = input('Enter AWS Region [us-east-1]: ').strip() or 'us-east-1'
+        if not selection:
+            page += 1
+        elif selection.isdigit() and 1 <= int(selection) <= len(matches):
+            return matches[int(selection) - 1]
+        elif selection == '/':
+            query, page = '', 0
+        elif search(selection.lstrip('/')):
+            query, page = selection.lstrip('/'), 0
+        else:
+            print(f"Nothing matches '{selection.lstrip('/')}'")
 
-    # 8. Save Configuration
-    config_dir = os.path.join(directory, '.ck-prism')
-    os.makedirs(config_dir, exist_ok=True)
-    config_file_path = os.path.join(config_dir, 'config.json')
-    
-    config = {}
-    if os.path.exists(config_file_path):
-        try:
-            with open(config_file_path, 'r') as f:
-                config = json.load(f)
-        except json.JSONDecodeError:
-            pass
-            
-    config[profile_name] = {
-        'prism_domain': prism_domain,
-        'realm': realm,
+def build_profile(temp_config, role, region, **extra):
+    """Settings saved for a profile of a RoleRecord."""
+    profile = {
+        'prism_domain': temp_config['prism_domain'],
+        'realm': temp_config['realm'],
         'client_id': 'ckauth-cli',
         'region': region,
         'output': 'json',
-        'role_arn': selected_role['full_arn'], # Save full ARN for exchange
-        'account_id': selected_account_id,
-        'role_name': selected_role['name']
+        'role_arn': role.full_arn, # Save full ARN for exchange
+        'account_id': role.account_id,
+        'role_name': role.name
     }
-    
-    with open(config_file_path, 'w') as f:
-        json.dump(config, f, indent=2)
-        
-    # Save the tokens we just got so we don't need to login again immediately
-    tokens_dir = os.path.join(config_dir, 'tokens')
-    os.makedirs(tokens_dir, exist_ok=True)
-    token_file = os.path.join(tokens_dir, f'{profile_name}_tokens.json')
-    
-    with open(token_file, 'w') as f:
-        json.dump(tokens, f, indent=2)
-    os.chmod(token_file, 0o600)
+    profile.update(extra)
+    return profile
 
-    print(f"\nConfiguration saved for profile '{profile_name}'!")
-    print(f"You can now login using: ck-prism login --profile {profile_name}")
\ No newline at end of file
+def render_profile_name(template, temp_config, role, account_names):
+    """Fill a name template; fields are {account}, {account_name}, {role} and {realm}."""
+    try:
+        name = template.format(
+            account=role.account_id,
+            account_name=account_names.get(role.account_id) or role.account_id,
+            role=role.name,
+            realm=temp_config['realm']
+        )
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Invalid name template '{template}': {e}. Available fields are {{account}}, {{account_name}}, {{role}} and {{realm}}.")
+        exit(1)
+    # Section names in the AWS files cannot hold whitespace or brackets
+    return re.sub(r'[\s\[\]]+', '-', name.strip())
+
+def generate_profiles(temp_config, index, template, region):
+    """One generated profile per role of a RoleIndex, named by ``template``. Exits on name collisions."""
+    profiles = {}
+    collisions = set()
+    for role in index:
+        name = render_profile_name(template, temp_config, role, index.account_names)
+        if name in profiles:
+            collisions.add(name)
+        profiles[name] = build_profile(temp_config, role, region,
+                                       generated_by='all-roles', name_template=template)
+    if collisions:
+        print(f"Name template '{template}' gives several roles the same profile name: {', '.join(sorted(collisions))}")
+        exit(1)
+    return profiles
+
+def configure_all_roles(directory, temp_config, index, args):
+    template = args.name_template or DEFAULT_NAME_TEMPLATE
+    desired = generate_profiles(temp_config, index, template, args.region or DEFAULT_REGION)
+    apply_profile_changes(directory, temp_config, desired, dry_run=args.dry_run)
+
+def configure_from_manifest(directory, args):
+    """Create the profiles listed in a manifest with one login and one role fetch.
+
+    The manifest names the realm and its profiles; each profile is matched
+    against the role catalog by ``role_arn`` or by ``account_id`` and
+    ``role_name``, and is named ``name`` or after the manifest's ``name_template``:
+
+        {"prism_domain": "prism.cloudkeeper.com", "realm": "sso", "region": "us-east-1",
+         "profiles": [{"name": "production", "account_id": "123456789012", "role_name": "Admin"}]}
+    """
+    try:
+        with open(args.manifest, 'r') as f:
+            manifest = json.load(f)
+    except OSError as e:
+        print(f'Could not read manifest {args.manifest}: {e}')
+        exit(1)
+    except ValueError as e:
+        print(f'Manifest {args.manifest} is not valid JSON: {e}')
+        exit(1)
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('profiles'), list):
+        print(f"Manifest {args.manifest} must be an object with a 'profiles' list")
+        exit(1)
+
+    prism_domain = args.prism_domain or manifest.get('prism_domain') or DEFAULT_PRISM_DOMAIN
+    realm = args.realm or manifest.get('realm')
+    if not realm:
+        print(f"Manifest {args.manifest} does not name a realm; add \"realm\" or pass --realm")
+        exit(1)
+    template = args.name_template or manifest.get('name_template') or DEFAULT_NAME_TEMPLATE
+    default_region = args.region or manifest.get('region') or DEFAULT_REGION
+
+    temp_config, roles, account_names = fetch_realm_roles(prism_domain, realm, directory, args.refresh_roles)
+    index = RoleIndex(roles, account_names)
+
+    desired = {}
+    missing = []
+    for entry in manifest['profiles']:
+        if not isinstance(entry, dict):
+            missing.append(str(entry))
+            continue
+        if entry.get('role_arn'):
+            role = index.find(entry['role_arn'])
+        else:
+            role = index.get(str(entry.get('account_id')), entry.get('role_name'))
+        if not role:
+            missing.append(entry.get('name') or entry.get('role_arn') or f"{entry.get('account_id')}/{entry.get('role_name')}")
+            continue
+        name = entry.get('name') or render_profile_name(template, temp_config, role, account_names)
+        desired[name] = build_profile(temp_config, role, entry.get('region') or default_region,
+                                      generated_by='manifest')
+
+    if missing:
+        print(f"{len(missing)} manifest entries do not match an available role: {', '.join(missing)}")
+        exit(1)
+
+    apply_profile_changes(directory, temp_config, desired, dry_run=args.dry_run)
+
+def sync_profiles(directory, args):
+    """Bring generated profiles in line with the role catalog of their realm.
+
+    Profiles created by --all-roles are added and removed as roles appear and
+    disappear, per name template and region they were generated with;
+    ``--name-template`` adds profiles for another template. Profiles from a
+    manifest are removed when their role is gone. Profiles created
+    interactively are never touched.
+    """
+    config = load_config(directory)
+
+    realms = {}
+    for name, profile in config.items():
+        if not profile.get('generated_by'):
+            continue
+        key = (profile.get('prism_domain', DEFAULT_PRISM_DOMAIN), profile['realm'])
+        realms.setdefault(key, {})[name] = profile
+    if args.realm:
+        key = (args.prism_domain or DEFAULT_PRISM_DOMAIN, args.realm)
+        realms = {key: realms.get(key, {})}
+    elif args.prism_domain:
+        realms = {key: generated for key, generated in realms.items() if key[0] == args.prism_domain}
+
+    if not realms:
+        print('No generated profiles to sync. Create some with ck-prism configure --all-roles or --from MANIFEST')
+        exit(1)
+
+    for (prism_domain, realm), generated in sorted(realms.items()):
+        temp_config, roles, account_names = fetch_realm_roles(prism_domain, realm, directory, refresh=True)
+        index = RoleIndex(roles, account_names)
+
+        # Each --all-roles run is regenerated with the template and region it
+        # was created with, so runs with different templates keep their profiles
+        groups = {}
+        for name, profile in generated.items():
+            if profile.get('generated_by') == 'all-roles' and profile.get('name_template'):
+                key = (profile['name_template'], profile.get('region') or DEFAULT_REGION)
+                groups.setdefault(key, set()).add(name)
+        if args.name_template or not generated:
+            groups.setdefault((args.name_template or DEFAULT_NAME_TEMPLATE, args.region or DEFAULT_REGION), set())
+
+        desired = {}
+        remove = []
+        for (template, region), names in sorted(groups.items()):
+            for name, profile in generate_profiles(temp_config, index, template, region).items():
+                if name in names:
+                    # Keep settings edited since the profile was generated
+                    desired[name] = dict(generated[name], role_arn=profile['role_arn'])
+                elif name not in generated and name not in desired:
+                    desired[name] = profile
+            remove.extend(name for name in names if name not in desired)
+
+        grouped = set().union(*groups.values())
+        for name, profile in generated.items():
+            if name in grouped:
+                continue
+            role = index.find(profile['role_arn'])
+            if role:
+                desired[name] = dict(profile, role_arn=role.full_arn)
+            else:
+                remove.append(name)
+
+        apply_profile_changes(directory, temp_config, desired, remove, config, args.dry_run)
+
+def apply_profile_changes(directory, temp_config, desired, remove=(), config=None, dry_run=False):
+    """Save the profiles of ``desired`` that changed and delete ``remove``, in one write.
+
+    Existing profiles that were not generated are left alone.
+    """
+    store = get_store(directory)
+    if config is None:
+        config = dict((store.profiles() or {}).items())
+
+    added = {}
+    updated = {}
+    skipped = []
+    for name, profile in desired.items():
+        existing = config[name] if name in config else None
+        if existing is None:
+            added[name] = profile
+        elif not existing.get('generated_by'):
+            skipped.append(name)
+        elif existing != profile:
+            updated[name] = profile
+    remove = sorted(remove)
+
+    for name in sorted(added):
+        print(f'  + {name}')
+    for name in sorted(updated):
+        print(f'  ~ {name}')
+    for name in remove:
+        print(f'  - {name}')
+    if skipped:
+        print(f"Skipped {len(skipped)} profiles that already exist and were not generated: {', '.join(sorted(skipped))}")
+    print(f'\n{len(added)} added, {len(updated)} updated, {len(remove)} removed')
+
+    if dry_run or not (added or updated or remove):
+        return
+
+    with span('save_config'):
+        store.save_profiles(dict(added, **updated), remove=remove)
+    record_profile_tokens(directory, {name: temp_config for name in added})
+    print('Configuration saved.')
@@ -0,0 +1,66 @@
+import sys
+import json
+import time
+import contextlib
+from ck_prism.ck_errors import PrismError
+from ck_prism.ck_cache import get_credential_cache_file, load_cached_credentials, store_cached_credentials
+from ck_prism.ck_common import (
+    FALLBACK_CREDENTIAL_LIFETIME, get_home_directory, load_config, get_profile_config, normalize_credentials,
+    parse_expiration, format_expiration
+)
+
+def credential_process_utility():
+    """Print credentials in the AWS SDK ``credential_process`` format.
+
+    Intended to be referenced from ~/.aws/config:
+
+        [profile production]
+        credential_process = ck-prism credential-process --profile production
+    """
+    profile = 'default'
+    if len(sys.argv) == 4 and sys.argv[2] == '--profile':
+        profile = sys.argv[3]
+    elif len(sys.argv) != 2:
+        print('Usage: ck-prism credential-process [--profile PROFILE_NAME]', file=sys.stderr)
+        exit(1)
+
+    # stdout is reserved for the JSON document the SDK parses
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            credentials = get_process_credentials(profile)
+        except PrismError as e:
+            print(e)
+            exit(1)
+
+    print(json.dumps(credentials))
+
+def get_process_credentials(profile):
+    directory = get_home_directory()
+    profile_config = get_profile_config(load_config(directory), profile)
+    role_arn = profile_config['role_arn']
+
+    cache_file = get_credential_cache_file(directory, profile_config, role_arn)
+    cached = load_cached_credentials(cache_file)
+    if cached:
+        return cached['credentials']
+
+    # Only a cache miss pays for importing the network stack
+    from ck_prism.ck_login import get_or_refresh_tokens, exchange_credentials
+
+    tokens = get_or_refresh_tokens(profile_config, directory, profile)
+    creds = exchange_credentials(profile_config, tokens['access_token'], role_arn)
+    access_key, secret_key, session_token, expiration = normalize_credentials(creds)
+
+    credentials = {
+        'Version': 1,
+        'AccessKeyId': access_key,
+        'SecretAccessKey': secret_key,
+        'SessionToken': session_token,
+    }
+
+    # Without an Expiration the SDK would keep the credentials forever
+    expires_at = parse_expiration(expiration) or time.time() + FALLBACK_CREDENTIAL_LIFETIME
+    credentials['Expiration'] = format_expiration(expires_at)
+    store_cached_credentials(cache_file, {'expires_at': expires_at, 'credentials': credentials})
+
+    return credentials
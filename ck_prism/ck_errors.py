@@ -0,0 +1,28 @@
+# Exceptions raised by ck-prism. Library callers (see ck_client) catch these;
+# the CLI prints the message and exits with status 1 (see main).
+
+class PrismError(Exception):
+    """Base class of every ck-prism error."""
+
+class ConfigurationError(PrismError):
+    """The configuration is missing or invalid, or has no such profile."""
+
+class LoginRequiredError(PrismError):
+    """A browser login is needed but the caller does not allow one."""
+
+class AuthenticationError(PrismError):
+    """The browser login failed, timed out or was cancelled, or its code was rejected."""
+
+class ApiError(PrismError):
+    """Prism answered with an error or an unexpected response."""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+class PrismConnectionError(PrismError):
+    """Prism could not be reached."""
+
+class InvalidTokenError(PrismError):
+    """A token failed local verification: bad signature, unknown key, or rejected claims."""
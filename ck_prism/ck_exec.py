@@ -0,0 +1,144 @@
+import os
+import sys
+import argparse
+import threading
+import contextlib
+import subprocess
+import concurrent.futures
+from ck_prism.ck_common import (
+    get_home_directory, load_config, get_profile_config, parse_expiration, format_expiration, add_profile_arguments,
+    select_profiles
+)
+from ck_prism.ck_login import DEFAULT_MAX_WORKERS, exchange_profiles
+
+USAGE = 'ck-prism exec [--profile PROFILE_NAME | --profiles A,B | --all] [--max-workers N] -- COMMAND [ARGS...]'
+
+# Variables that would make an SDK pick credentials other than the injected ones
+CLEARED_VARIABLES = ('AWS_PROFILE', 'AWS_DEFAULT_PROFILE', 'AWS_CREDENTIAL_EXPIRATION')
+
+def exec_utility():
+    """Run a command with a profile's credentials in its environment.
+
+        ck-prism exec --profile production -- aws sts get-caller-identity
+        ck-prism exec --all --max-workers 16 -- ./inventory.sh
+    """
+    directory = get_home_directory()
+
+    parser = argparse.ArgumentParser(prog='ck-prism exec', usage=USAGE)
+    add_profile_arguments(parser, 'run the command for', default='default')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Commands and credential exchanges run at once (default {DEFAULT_MAX_WORKERS})')
+
+    # Everything after -- is the command, passed on exactly as given
+    argv = sys.argv[2:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    command = argv[split + 1:]
+    if not command:
+        print(f'Usage: {USAGE}')
+        exit(1)
+
+    config = load_config(directory)
+    fan_out = bool(args.profiles or args.all)
+    profiles = select_profiles(args, config)
+    if not profiles:
+        print('No profiles to run the command for. Run ck-prism configure')
+        exit(1)
+
+    # Progress messages go to stderr so that stdout belongs to the command
+    with contextlib.redirect_stdout(sys.stderr):
+        results, failed = exchange_profiles(config, profiles, directory, args.max_workers)
+
+    environments = {
+        profile: build_environment(profile, get_profile_config(config, profile), results[profile])
+        for profile in profiles if profile in results
+    }
+
+    if not fan_out:
+        if failed:
+            exit(1)
+        exit(run_command(command, environments[profiles[0]]))
+
+    codes = run_parallel(command, environments, args.max_workers)
+
+    errors = [f'{profile} (login failed)' for profile in failed]
+    errors += [f'{profile} (exit {code})' for profile, code in sorted(codes.items()) if code != 0]
+    if errors:
+        print(f"\nCommand failed for {len(errors)} of {len(profiles)} profiles: {', '.join(errors)}", file=sys.stderr)
+        exit(1)
+
+def build_environment(profile, profile_config, credentials):
+    """Copy of the current environment with the profile's credentials and region.
+
+    ``credentials`` is the tuple returned by normalize_credentials.
+    """
+    access_key, secret_key, session_token, expiration = credentials
+
+    env = dict(os.environ)
+    for name in CLEARED_VARIABLES:
+        env.pop(name, None)
+    env.update({
+        'AWS_ACCESS_KEY_ID': access_key,
+        'AWS_SECRET_ACCESS_KEY': secret_key,
+        'AWS_SESSION_TOKEN': session_token,
+        'AWS_REGION': profile_config['region'],
+        'AWS_DEFAULT_REGION': profile_config['region'],
+        'CK_PRISM_PROFILE': profile
+    })
+
+    expires_at = parse_expiration(expiration)
+    if expires_at:
+        env['AWS_CREDENTIAL_EXPIRATION'] = format_expiration(expires_at)
+    return env
+
+def run_command(command, env):
+    """Run the command in the foreground and return its exit status."""
+    try:
+        process = subprocess.Popen(command, env=env)
+    except OSError as e:
+        print(f'Failed to run {command[0]}: {e}', file=sys.stderr)
+        return 127
+
+    while True:
+        try:
+            return exit_status(process.wait())
+        except KeyboardInterrupt:
+            # The child got the same SIGINT; wait for it to exit
+            continue
+
+def run_parallel(command, environments, max_workers=DEFAULT_MAX_WORKERS):
+    """Run the command once per profile, prefixing each output line with the profile name.
+
+    Returns a dict of profile name to exit status.
+    """
+    width = max(len(profile) for profile in environments) if environments else 0
+    output_lock = threading.Lock()
+
+    def run(profile):
+        prefix = f'[{profile}]'.ljust(width + 2) + ' '
+        try:
+            process = subprocess.Popen(command, env=environments[profile], stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError as e:
+            with output_lock:
+                print(f'{prefix}Failed to run {command[0]}: {e}', file=sys.stderr)
+            return 127
+
+        with process.stdout:
+            for line in iter(process.stdout.readline, b''):
+                text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                with output_lock:
+                    sys.stdout.write(f'{prefix}{text}\n')
+                    sys.stdout.flush()
+        return exit_status(process.wait())
+
+    codes = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(run, profile): profile for profile in environments}
+        for future in concurrent.futures.as_completed(futures):
+            codes[futures[future]] = future.result()
+    return codes
+
+def exit_status(returncode):
+    # A child killed by a signal reports -N; shells report 128 + N
+    return 128 - returncode if returncode < 0 else returncode
@@ -0,0 +1,78 @@
+import os
+import time
+import threading
+import contextlib
+from ck_prism.ck_trace import span
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def _lock_fd(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    # msvcrt.LK_LOCK gives up after ~10 seconds; keep waiting like flock does
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+
+def _unlock_fd(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path`` (created if missing).
+
+    The lock is shared between processes and between threads, since each
+    call opens its own file description.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        with span('lock_wait', path=os.path.basename(path)):
+            _lock_fd(fd)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, content, mode=0o600, newline=None):
+    """Replace ``path`` with ``content`` via a temporary file and os.replace.
+
+    An existing file keeps its permissions; a new one is created with ``mode``.
+    A symlink is followed and its target replaced, so dotfile links survive.
+    ``newline`` is passed to open(); '' writes line endings unchanged.
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        pass
+
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, 'w', newline=newline) as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
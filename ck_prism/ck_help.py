@@ -10,20 +10,68 @@ This CLI tool authenticates with AWS and provides AWS credentials.
 COMMANDS:
   configure  Configure authentication settings
   login      Authenticate and get AWS credentials
+  credential-process
+             Print cached AWS credentials for the AWS SDK credential_process setting
+  agent      Serve credentials to AWS SDKs over a local container-credentials endpoint
+  watch      Keep credentials in ~/.aws/credentials fresh in the background
+  exec       Run a command with a profile's credentials in its environment
+  status     Show token and credential expiry for every profile, without network access
+  loadtest   Replay token refresh and exchange requests against Prism and report latency
   help       Show this help message
 
 USAGE:
-  ck-prism configure
+  ck-prism configure [--refresh-roles] [--prism-domain DOMAIN] [--realm TENANT]
+  ck-prism configure --all-roles [--name-template TEMPLATE] [--region REGION] [--dry-run]
+  ck-prism configure --from MANIFEST [--dry-run]
+  ck-prism configure --sync [--realm TENANT] [--dry-run]
   ck-prism login --profile PROFILE_NAME
+  ck-prism login --profiles PROFILE_A,PROFILE_B [--max-workers N]
+  ck-prism login --all [--max-workers N]
+  ck-prism credential-process --profile PROFILE_NAME
+  ck-prism agent [--profiles PROFILE_A,PROFILE_B | --all] [--port PORT]
+  ck-prism watch [--profiles PROFILE_A,PROFILE_B | --all] [--daemon]
+  ck-prism exec --profile PROFILE_NAME -- COMMAND [ARGS...]
+  ck-prism exec --profiles PROFILE_A,PROFILE_B | --all [--max-workers N] -- COMMAND [ARGS...]
+  ck-prism status [--profile PROFILE_NAME] [--json]
+  ck-prism loadtest [--profile PROFILE_NAME] --refresh-token TOKEN... [--scenario login|refresh|exchange]
+                    [--concurrency N] [--rate PER_SECOND] [--duration SECONDS | --requests N] [--json]
   ck-prism help
 
+GLOBAL OPTIONS (anywhere before --):
+  --timings              Print a per-phase timing table on stderr
+  --trace-file FILE      Write a trace (FILE.json: Chrome trace events, otherwise JSON lines)
+  --trace-format FORMAT  Force the trace format: chrome or jsonl
+  --cprofile FILE        Write cProfile statistics to FILE
+
 EXAMPLES:
   # Configure a new profile
   ck-prism configure
 
+  # Create a profile for every role, e.g. 123456789012-Admin
+  ck-prism configure --all-roles --realm sso --name-template '{account}-{role}'
+
   # Login with a specific profile
   ck-prism login --profile production
 
+  # Refresh every configured profile at once
+  ck-prism login --all
+
+  # Let the AWS SDK fetch credentials on demand (in ~/.aws/config)
+  [profile production]
+  credential_process = ck-prism credential-process --profile production
+
+  # Serve credentials from memory to containers and test runners
+  ck-prism agent --profiles production,staging
+
+  # Run a script in every account, 16 at a time
+  ck-prism exec --all --max-workers 16 -- ./inventory.sh
+
+  # Load test a staging tenant with 2 workers, each replaying its own refresh token
+  ck-prism loadtest --profile staging --refresh-token "$RT1" --refresh-token "$RT2" --concurrency 2
+
+  # Refresh credentials shortly before they expire, in the background
+  ck-prism watch --all --daemon
+
 For more information, visit: https://www.cloudkeeper.com/
     '''
     print(help_content)
\ No newline at end of file
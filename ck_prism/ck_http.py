@@ -0,0 +1,152 @@
+import os
+import time
+import random
+import threading
+import email.utils
+import urllib.parse
+import concurrent.futures
+import requests
+from requests.adapters import HTTPAdapter
+from ck_prism.ck_trace import span
+
+# Transport settings, overridable through the environment
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 3
+# Connections kept open per host; sized for concurrent multi-profile logins
+POOL_MAXSIZE = 32
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+# A Retry-After longer than this is returned to the caller instead of slept on
+MAX_RETRY_AFTER = 30
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def get_timeout():
+    """(connect, read) timeout from CK_PRISM_CONNECT_TIMEOUT / CK_PRISM_READ_TIMEOUT."""
+    return (_env_float('CK_PRISM_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+            _env_float('CK_PRISM_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+
+def get_max_retries():
+    return max(0, int(_env_float('CK_PRISM_MAX_RETRIES', DEFAULT_MAX_RETRIES)))
+
+def get_hedge_delay():
+    """Seconds after which a hedged request is sent (CK_PRISM_HEDGE_AFTER, 0 disables)."""
+    return max(0.0, _env_float('CK_PRISM_HEDGE_AFTER', 0))
+
+def get_session(url):
+    """Return the pooled keep-alive session for the scheme and host of ``url``."""
+    parsed = urllib.parse.urlsplit(url)
+    key = (parsed.scheme, parsed.netloc)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount(f'{parsed.scheme}://', adapter)
+            _sessions[key] = session
+    return session
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given zero-based attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def parse_retry_after(response):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP-date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def post(url, retry=True, **kwargs):
+    """POST through the pooled session, retrying connection errors, 429 and 5xx.
+
+    Pass ``retry=False`` for requests that must not be repeated, such as
+    redeeming a one-time authorization code.
+    """
+    return request('POST', url, retry, **kwargs)
+
+def get(url, retry=True, **kwargs):
+    """GET through the pooled session, with the same retries as post."""
+    return request('GET', url, retry, **kwargs)
+
+def request(method, url, retry=True, **kwargs):
+    kwargs.setdefault('timeout', get_timeout())
+    session = get_session(url)
+    attempts = get_max_retries() + 1 if retry else 1
+
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            with span(f'http.{method.lower()}', host=urllib.parse.urlsplit(url).netloc, attempt=attempt + 1):
+                response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if last_attempt:
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+            delay = parse_retry_after(response)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            elif delay > MAX_RETRY_AFTER:
+                return response
+        with span('http.backoff', seconds=round(delay, 3)):
+            time.sleep(delay)
+
+def hedged_post(url, hedge_after=None, **kwargs):
+    """POST an idempotent request, sending a second copy if the first is slow.
+
+    The first successful (non-5xx) response wins. Hedging is disabled when
+    ``hedge_after`` (default: CK_PRISM_HEDGE_AFTER) is 0. A refresh_token
+    grant is only idempotent when the realm neither rotates nor revokes
+    reused refresh tokens.
+    """
+    if hedge_after is None:
+        hedge_after = get_hedge_delay()
+    if not hedge_after:
+        return post(url, **kwargs)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        futures = [executor.submit(post, url, **kwargs)]
+        done, _ = concurrent.futures.wait(futures, timeout=hedge_after)
+        if not done:
+            futures.append(executor.submit(post, url, **kwargs))
+
+        error = None
+        response = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            if response.status_code < 500:
+                return response
+        if response is not None:
+            return response
+        raise error
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,194 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+from ck_prism.ck_cache import get_realm_digest
+from ck_prism.ck_files import atomic_write
+from ck_prism.ck_errors import InvalidTokenError, ApiError, PrismConnectionError
+
+# Local verification of Prism (Keycloak) access tokens against the realm's
+# JSON Web Key Set. Only RS256 is accepted, which is what Keycloak signs
+# access tokens with; the RSA check is done in pure Python so that no
+# crypto package is needed.
+
+# Cached key sets are used for this long before being fetched again
+JWKS_TTL = 86400
+# A key ID the realm did not publish is looked up again at most this often
+JWKS_REFETCH_INTERVAL = 300
+# Allowed difference between the local clock and Prism's
+CLOCK_SKEW = 60
+
+# DER prefix of a SHA-256 DigestInfo (RFC 8017, section 9.2)
+SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+def b64url_decode(value):
+    if isinstance(value, str):
+        value = value.encode('ascii')
+    return base64.urlsafe_b64decode(value + b'=' * (-len(value) % 4))
+
+def is_jwt(token):
+    """True when ``token`` looks like a compact JWS; opaque tokens cannot be verified locally."""
+    return isinstance(token, str) and token.count('.') == 2
+
+def decode_jwt(token):
+    """Split a compact JWS into ``(header, claims, signing_input, signature)``, unverified."""
+    try:
+        header_segment, claims_segment, signature = token.split('.')
+        header = json.loads(b64url_decode(header_segment).decode('utf-8'))
+        claims = json.loads(b64url_decode(claims_segment).decode('utf-8'))
+        signing_input = f'{header_segment}.{claims_segment}'.encode('ascii')
+        signature = b64url_decode(signature)
+    except (AttributeError, ValueError, UnicodeError) as e:
+        raise InvalidTokenError(f'Malformed token: {e}')
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise InvalidTokenError('Malformed token: header and claims must be JSON objects')
+    return header, claims, signing_input, signature
+
+def verify_rs256(signing_input, signature, jwk):
+    """Check an RSASSA-PKCS1-v1_5 SHA-256 signature against an RSA JWK."""
+    try:
+        n = int.from_bytes(b64url_decode(jwk['n']), 'big')
+        e = int.from_bytes(b64url_decode(jwk['e']), 'big')
+    except (KeyError, ValueError, TypeError):
+        return False
+
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    s = int.from_bytes(signature, 'big')
+    if s >= n:
+        return False
+
+    digest_info = SHA256_DIGEST_INFO + hashlib.sha256(signing_input).digest()
+    padding = size - len(digest_info) - 3
+    if padding < 8:
+        return False
+    expected = b'\x00\x01' + b'\xff' * padding + b'\x00' + digest_info
+    return hmac.compare_digest(pow(s, e, n).to_bytes(size, 'big'), expected)
+
+def validate_claims(claims, issuer, client_id, audience=None, min_ttl=0, now=None, leeway=CLOCK_SKEW):
+    """Check issuer, audience and the validity window of access token ``claims``.
+
+    Keycloak access tokens name the client in ``azp`` and often carry
+    ``aud: account``, so without an explicit ``audience`` either ``azp`` or
+    ``aud`` must name ``client_id``. The token must stay valid for
+    ``min_ttl`` more seconds, give or take ``leeway``.
+    """
+    now = time.time() if now is None else now
+
+    if claims.get('iss') != issuer:
+        raise InvalidTokenError(f"Token issued by {claims.get('iss')!r}, expected {issuer!r}")
+
+    audiences = claims.get('aud') or []
+    if isinstance(audiences, str):
+        audiences = [audiences]
+    if audience:
+        if audience not in audiences:
+            raise InvalidTokenError(f'Token is not intended for audience {audience!r}')
+    elif client_id not in audiences and claims.get('azp') != client_id:
+        raise InvalidTokenError(f'Token was not issued to client {client_id!r}')
+
+    try:
+        exp = float(claims['exp'])
+        iat = float(claims.get('iat', now))
+        nbf = float(claims.get('nbf', iat))
+    except (KeyError, TypeError, ValueError):
+        raise InvalidTokenError('Token has no valid exp claim')
+    if exp <= now + min_ttl - leeway:
+        raise InvalidTokenError('Token expired' if exp <= now - leeway else 'Token expires too soon')
+    if min(iat, nbf) > now + leeway:
+        raise InvalidTokenError('Token is not valid yet; check the system clock')
+
+def get_issuer(config):
+    return f"{config['keycloak_base_url']}/realms/{config['realm']}"
+
+def get_jwks_file(directory, config):
+    return os.path.join(directory, '.ck-prism', 'cache', 'jwks', f'{get_realm_digest(config)}.json')
+
+def load_jwks(cache_file):
+    """Return the cached key set (``keys``, ``fetched_at``, ``misses``) or None."""
+    try:
+        with open(cache_file, 'r') as f:
+            jwks = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(jwks, dict) or not isinstance(jwks.get('keys'), list):
+        return None
+    jwks.setdefault('fetched_at', 0)
+    jwks.setdefault('misses', {})
+    return jwks
+
+def fetch_jwks(config, cache_file, misses=None):
+    """Download the realm's key set and cache it; raises ApiError or PrismConnectionError.
+
+    ``misses`` maps key IDs that were looked up but not found to when.
+    """
+    # Only a fetch pays for importing the network stack
+    import requests
+    from ck_prism import ck_http
+
+    try:
+        response = ck_http.get(f'{get_issuer(config)}/protocol/openid-connect/certs')
+        if response.status_code != 200:
+            raise ApiError(f'Failed to fetch signing keys: {response.text}', response.status_code, response.text)
+        keys = response.json()['keys']
+    except requests.exceptions.RequestException as e:
+        raise PrismConnectionError(f'Error fetching signing keys: {e}')
+    except (ValueError, KeyError, TypeError) as e:
+        raise ApiError(f'Unexpected signing key response: {e}')
+
+    now = time.time()
+    misses = {kid: at for kid, at in (misses or {}).items() if at + JWKS_REFETCH_INTERVAL > now}
+    jwks = {'fetched_at': now, 'keys': keys, 'misses': misses}
+    atomic_write(cache_file, json.dumps(jwks))
+    return jwks
+
+def find_key(jwks, kid):
+    for key in (jwks or {}).get('keys', []):
+        if key.get('kid') == kid and key.get('kty') == 'RSA' and key.get('use', 'sig') == 'sig':
+            return key
+    return None
+
+def verify_access_token(config, access_token, directory, min_ttl=0):
+    """Verify an access token's signature and claims against the realm's cached JWKS.
+
+    The key set is refetched when its TTL has passed, or when the token
+    names a key it does not hold (key rotation); a key ID that is still
+    missing afterwards is not looked up again for JWKS_REFETCH_INTERVAL
+    seconds. Returns the claims; raises InvalidTokenError, or ApiError /
+    PrismConnectionError when the key set is needed but cannot be fetched.
+    """
+    header, claims, signing_input, signature = decode_jwt(access_token)
+    if header.get('alg') != 'RS256':
+        raise InvalidTokenError(f"Unsupported token algorithm {header.get('alg')!r}")
+
+    kid = header.get('kid')
+    cache_file = get_jwks_file(directory, config)
+    jwks = load_jwks(cache_file)
+    key = find_key(jwks, kid)
+
+    now = time.time()
+    misses = jwks['misses'] if jwks else {}
+    stale = not jwks or jwks['fetched_at'] + JWKS_TTL <= now
+    if stale or (key is None and misses.get(kid, 0) + JWKS_REFETCH_INTERVAL <= now):
+        try:
+            jwks = fetch_jwks(config, cache_file, misses)
+        except (ApiError, PrismConnectionError):
+            # A stale key set that still holds the key is better than none
+            if key is None:
+                raise
+        else:
+            key = find_key(jwks, kid)
+            if key is None and kid:
+                jwks['misses'][kid] = now
+                atomic_write(cache_file, json.dumps(jwks))
+
+    if key is None:
+        raise InvalidTokenError(f'Token signed with unknown key {kid!r}')
+    if not verify_rs256(signing_input, signature, key):
+        raise InvalidTokenError('Invalid token signature')
+
+    validate_claims(claims, get_issuer(config), config['client_id'], config.get('token_audience'), min_ttl)
+    return claims
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import requests
+from ck_prism import ck_http
+from ck_prism.ck_common import get_home_directory, load_config, get_profile_config
+from ck_prism.ck_login import get_token_url, build_refresh_request, build_exchange_request
+
+SCENARIOS = ('login', 'refresh', 'exchange')
+OPERATIONS = ('refresh', 'exchange')
+DEFAULT_CONCURRENCY = 4
+DEFAULT_DURATION = 10
+REFRESH_TOKEN_ENV = 'CK_PRISM_LOADTEST_REFRESH_TOKEN'
+# Access tokens used by the exchange scenario are renewed this long before expiry
+ACCESS_TOKEN_MARGIN = 30
+
+def loadtest_utility():
+    """Replay the CLI's token refresh and role exchange requests under load.
+
+        ck-prism loadtest --profile staging --refresh-token "$RT" --rate 50 --requests 2000
+
+    The refresh tokens must be given explicitly: the cached login is never
+    used, so a load test cannot rotate it away.
+    """
+    parser = argparse.ArgumentParser(prog='ck-prism loadtest')
+    parser.add_argument('--profile', default='default', help='Profile whose Prism endpoints and role are tested')
+    parser.add_argument('--refresh-token', action='append', default=[],
+                        help=f'Refresh token to replay; repeat it to give workers their own tokens '
+                             f'(default: comma-separated {REFRESH_TOKEN_ENV})')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='login',
+                        help='login: refresh then exchange (default); refresh or exchange alone')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Iterations in flight at once (default {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=0, help='Iterations started per second (default: unlimited)')
+    parser.add_argument('--duration', type=float, help=f'Seconds to run (default {DEFAULT_DURATION})')
+    parser.add_argument('--requests', type=int, help='Iterations to run instead of a duration')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(sys.argv[2:])
+
+    if args.concurrency < 1 or args.rate < 0 or (args.requests is not None and args.requests < 1):
+        print('ERROR: --concurrency and --requests must be at least 1 and --rate cannot be negative')
+        exit(1)
+    duration = args.duration if args.duration or args.requests else DEFAULT_DURATION
+
+    profile_config = get_profile_config(load_config(get_home_directory()), args.profile)
+    refresh_tokens = args.refresh_token or [token.strip() for token in
+                                            os.environ.get(REFRESH_TOKEN_ENV, '').split(',') if token.strip()]
+    if not refresh_tokens:
+        print(f'ERROR: pass --refresh-token or set {REFRESH_TOKEN_ENV}. '
+              'The cached login is not used, because replaying it would rotate it away.')
+        exit(1)
+    if len(refresh_tokens) < args.concurrency:
+        print(f'Note: {len(refresh_tokens)} refresh token(s) for {args.concurrency} workers; workers share tokens, '
+              'which fails on realms that revoke reused refresh tokens', file=sys.stderr)
+
+    generator = LoadGenerator(profile_config, refresh_tokens, args.scenario, args.rate)
+    if not args.json:
+        limit = f'{args.requests} iterations' if args.requests else f'{duration:g}s'
+        rate = f'{args.rate:g}/s' if args.rate else 'unlimited'
+        print(f"Load testing {profile_config['keycloak_base_url']} (realm '{profile_config['realm']}'): "
+              f'scenario {args.scenario}, concurrency {args.concurrency}, rate {rate}, {limit}')
+    report = generator.run(args.concurrency, duration, args.requests)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+class LoadGenerator:
+    """Sends the CLI's refresh and exchange requests from ``concurrency`` threads.
+
+    One iteration of the ``login`` scenario is what a CLI login with an
+    expired access token does: a refresh_token grant, then an /exchange for
+    the profile's role with the new access token. Requests go through
+    ck_http's pooled sessions without retries, so every failure is counted.
+
+    Worker ``i`` replays ``refresh_tokens[i % len(refresh_tokens)]`` and
+    keeps the rotated token the server returns for its next refresh, so
+    realms that rotate refresh tokens need one token per worker.
+    """
+
+    def __init__(self, config, refresh_tokens, scenario='login', rate=0):
+        self.config = config
+        self.scenario = scenario
+        self.rate = rate
+        self._refresh_tokens = list(refresh_tokens)
+        self._access_token = None
+        self._access_expires_at = 0
+        self._lock = threading.Lock()
+        self._next_start = None
+        self._stop_at = None
+        self._remaining = None
+        self.iterations = 0
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.errors = {operation: {} for operation in OPERATIONS}
+
+    def run(self, concurrency, duration=None, iterations=None):
+        """Run until ``duration`` seconds pass or ``iterations`` complete; returns the report."""
+        if self.scenario == 'exchange':
+            # Setup, not measured: the exchange scenario needs an access token
+            if not self._renew_access_token(0):
+                return self.report(0)
+            self.latencies['refresh'] = []
+
+        start = time.perf_counter()
+        self._stop_at = start + duration if duration else None
+        self._remaining = iterations
+        threads = [threading.Thread(target=self._worker, args=(i % len(self._refresh_tokens),), daemon=True)
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            # Let in-flight requests finish and report what was measured
+            with self._lock:
+                self._remaining = 0
+            for thread in threads:
+                thread.join()
+        return self.report(time.perf_counter() - start)
+
+    def _worker(self, slot):
+        while self._start_iteration():
+            if self.scenario == 'exchange':
+                access_token = self._current_access_token(slot)
+            else:
+                access_token = self._refresh(slot)
+            if access_token and self.scenario != 'refresh':
+                self._exchange(access_token)
+
+    def _start_iteration(self):
+        """Claim the next iteration, waiting for its slot when a rate is set."""
+        with self._lock:
+            if self._remaining is not None:
+                if self._remaining <= 0:
+                    return False
+                self._remaining -= 1
+            now = time.perf_counter()
+            start_at = now
+            if self.rate:
+                start_at = max(now, self._next_start or now)
+                self._next_start = start_at + 1.0 / self.rate
+            if self._stop_at is not None and start_at >= self._stop_at:
+                return False
+            self.iterations += 1
+        if start_at > now:
+            time.sleep(start_at - now)
+        return True
+
+    def _refresh(self, slot):
+        """One refresh_token grant with the token in ``slot``; returns the new access token, or None."""
+        with self._lock:
+            refresh_token = self._refresh_tokens[slot]
+        token_data = self._request('refresh', get_token_url(self.config), expect='access_token',
+                                   data=build_refresh_request(self.config, refresh_token))
+        if token_data is None:
+            return None
+        with self._lock:
+            # Keep working when the realm rotates refresh tokens
+            self._refresh_tokens[slot] = token_data.get('refresh_token', refresh_token)
+            self._access_token = token_data['access_token']
+            self._access_expires_at = time.time() + token_data.get('expires_in', 300)
+        return token_data['access_token']
+
+    def _exchange(self, access_token):
+        headers, payload = build_exchange_request(self.config, access_token, self.config['role_arn'])
+        self._request('exchange', self.config['api_endpoint'], json=payload, headers=headers)
+
+    def _current_access_token(self, slot):
+        with self._lock:
+            if self._access_expires_at > time.time() + ACCESS_TOKEN_MARGIN:
+                return self._access_token
+        return self._renew_access_token(slot)
+
+    def _renew_access_token(self, slot):
+        access_token = self._refresh(slot)
+        if not access_token:
+            print('Could not obtain an access token for the exchange scenario', file=sys.stderr)
+        return access_token
+
+    def _request(self, operation, url, expect=None, **kwargs):
+        """POST once and record the outcome; returns the JSON body when it succeeded.
+
+        A 200 whose body is not a JSON object, or lacks the ``expect`` field,
+        is counted as an error.
+        """
+        start = time.perf_counter()
+        try:
+            response = ck_http.post(url, retry=False, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._record_error(operation, type(e).__name__)
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            self._record_error(operation, f'HTTP {response.status_code}')
+            return None
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or (expect and expect not in body):
+            self._record_error(operation, 'Invalid response')
+            return None
+        with self._lock:
+            self.latencies[operation].append(elapsed)
+        return body
+
+    def _record_error(self, operation, kind):
+        with self._lock:
+            self.errors[operation][kind] = self.errors[operation].get(kind, 0) + 1
+
+    def report(self, elapsed):
+        """Throughput, latency percentiles (of successful requests) and errors per operation."""
+        operations = {}
+        for operation in OPERATIONS:
+            samples = sorted(self.latencies[operation])
+            failed = sum(self.errors[operation].values())
+            total = len(samples) + failed
+            if not total:
+                continue
+            operations[operation] = {
+                'requests': total,
+                'succeeded': len(samples),
+                'failed': failed,
+                'error_rate': round(failed / total, 4),
+                'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+                'p50_ms': percentile(samples, 50),
+                'p95_ms': percentile(samples, 95),
+                'p99_ms': percentile(samples, 99),
+                'max_ms': round(samples[-1], 3) if samples else None,
+                'errors': dict(sorted(self.errors[operation].items(), key=lambda item: -item[1]))
+            }
+        return {
+            'scenario': self.scenario,
+            'elapsed_s': round(elapsed, 3),
+            'iterations': self.iterations,
+            'operations': operations
+        }
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted ``samples``, or None when there are none."""
+    if not samples:
+        return None
+    rank = max(1, int(math.ceil(p / 100.0 * len(samples))))
+    return round(samples[rank - 1], 3)
+
+def print_report(report):
+    print(f"\n{report['iterations']} iterations in {report['elapsed_s']:.1f}s\n")
+    header = f"{'OPERATION':<10} {'REQUESTS':>9} {'FAILED':>7} {'REQ/S':>9} {'P50 MS':>9} {'P95 MS':>9} {'P99 MS':>9} {'MAX MS':>9}"
+    print(header)
+    for operation, stats in report['operations'].items():
+        cells = [format_ms(stats[key]) for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        print(f"{operation:<10} {stats['requests']:>9} {stats['failed']:>7} {stats['throughput_rps']:>9.1f} "
+              + ' '.join(f'{cell:>9}' for cell in cells))
+
+    errors = [(operation, kind, count) for operation, stats in report['operations'].items()
+              for kind, count in stats['errors'].items()]
+    if errors:
+        print('\nErrors:')
+        for operation, kind, count in errors:
+            print(f'  {operation:<10} {kind:<24} {count}')
+
+def format_ms(value):
+    return '-' if value is None else f'{value:.1f}'
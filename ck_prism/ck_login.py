@@ -2,145 +2,372 @@ import sys
 import subprocess
 import json
 import os
-import configparser 
+import re
 import time
 import hashlib
 import base64
 import secrets
 import urllib.parse
-import http.server
-import socketserver
-import threading
+import argparse
+import concurrent.futures
 import requests
+from ck_prism import ck_http
+from ck_prism.ck_trace import traced
+from ck_prism.ck_status import load_status_index, update_status_index, record_tokens
+from ck_prism.ck_files import file_lock, atomic_write
+from ck_prism.ck_aws_files import get_aws_credentials_path, get_aws_config_path, get_config_section, update_ini_file
+from ck_prism.ck_cache import ROLE_CATALOG_TTL
+from ck_prism.ck_store import get_store
+from ck_prism.ck_errors import (
+    PrismError, ConfigurationError, LoginRequiredError, AuthenticationError, ApiError, PrismConnectionError,
+    InvalidTokenError
+)
+from ck_prism.ck_jwt import is_jwt, verify_access_token
+from ck_prism.ck_callback import acquire_callback_server, release_callback_server, cancel_pending_logins
+from ck_prism.ck_common import (
+    get_home_directory, load_config, get_profile_config, normalize_credentials, parse_expiration, progress,
+    add_profile_arguments, select_profiles
+)
 
-# Default domain configuration
-DEFAULT_PRISM_DOMAIN = 'prism.cloudkeeper.com'
+# Concurrent credential exchanges for multi-profile logins
+DEFAULT_MAX_WORKERS = 8
+# Cached access tokens are used while they stay valid for this many seconds
+TOKEN_MIN_TTL = 300
+# Seconds to wait for the browser to complete an interactive login
+DEFAULT_LOGIN_TIMEOUT = 180
+# Seconds to wait for a silent (prompt=none) login before falling back
+DEFAULT_SILENT_LOGIN_TIMEOUT = 15
+# Profile ``login_prompt`` values; ``auto`` tries ``none`` and then ``consent``
+LOGIN_PROMPTS = ('auto', 'none', 'consent', 'login')
 
-def get_prism_base_url(prism_domain=DEFAULT_PRISM_DOMAIN):
-    """Get the login base URL for the given Prism domain."""
-    return f'https://login.{prism_domain}'
+def login_utility():
+    directory = get_home_directory()
 
-def get_api_endpoint(prism_domain=DEFAULT_PRISM_DOMAIN):
-    """Get the API endpoint for the given Prism domain."""
-    return f'https://cli.{prism_domain}/exchange'
+    parser = argparse.ArgumentParser(prog='ck-prism login')
+    add_profile_arguments(parser, 'log in', default='default')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent credential exchanges (default {DEFAULT_MAX_WORKERS})')
+    args = parser.parse_args(sys.argv[2:])
 
-def get_home_directory():
-    if sys.platform.startswith('linux') or sys.platform.startswith('darwin'):
-        # Linux or MacOS
-        cmd = 'echo $HOME'
-    elif sys.platform.startswith('win'):
-        # Windows
-        cmd = 'echo %USERPROFILE%'
-    else:
-        print(f'Unsupported platform: {sys.platform}')
-        exit(1)
+    config = load_config(directory)
 
-    directory = subprocess.run(cmd, shell=True, capture_output=True)
-    directory = directory.stdout.decode('utf-8').strip()
-    return directory
+    if args.profiles or args.all:
+        login_profiles(config, select_profiles(args, config), directory, args.max_workers)
+        return
 
-def login_utility():
-    directory = get_home_directory()
+    profile = args.profile
+    if profile != 'default':
+        print(f'Using {profile} profile')
 
-    profile = 'default'
-    if len(sys.argv) == 2:
-        pass # Default profile
-    elif len(sys.argv) == 4:
-        if sys.argv[2] == '--profile':
-            profile = sys.argv[3]
-            print(f'Using {profile} profile')
-        else:
-            print(f'Invalid flag {sys.argv[2]}. Acceptable flag is --profile.')
-            exit()
+    # The CLI is a thin wrapper over the library client
+    from ck_prism.ck_client import PrismClient
 
-    config_path = os.path.join(directory, '.ck-prism', 'config.json')
-    if not os.path.exists(config_path):
-        print(f'Configuration not found. Run ck-prism configure')
-        exit(1)
+    client = PrismClient(profile, directory, config, interactive=True, verbose=True)
+    credentials = client.get_credentials(min_ttl=float('inf'))
+    record_profile_tokens(directory, {profile: client.profile_config()})
 
-    try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-    except json.JSONDecodeError:
-        print(f'Configuration file is invalid or empty. Run ck-prism configure')
-        exit(1)
-    
-    if not config or profile not in config:
-        if profile == 'default':
-            print(f'No configuration found. Run ck-prism configure')
-        else:
-            print(f'Profile {profile} not found. Run ck-prism configure')
+    write_aws_credentials(credentials.as_process_output(), profile, directory, credentials.region)
+
+def login_profiles(config, profiles, directory, max_workers=DEFAULT_MAX_WORKERS):
+    """Log in several profiles and write all of their credentials in one go."""
+    if not profiles:
+        print('No profiles to log in. Run ck-prism configure')
         exit(1)
 
-    profile_config = config[profile]
+    results, failed = exchange_profiles(config, profiles, directory, max_workers)
 
-    # Get Prism domain from config (with default)
-    prism_domain = profile_config.get('prism_domain', DEFAULT_PRISM_DOMAIN)
-    profile_config['keycloak_base_url'] = get_prism_base_url(prism_domain)
-    profile_config['api_endpoint'] = get_api_endpoint(prism_domain)
+    if results:
+        write_aws_credentials_batch(
+            [(profile, results[profile], get_profile_config(config, profile)['region'])
+             for profile in profiles if profile in results],
+            directory
+        )
 
-    tokens = get_or_refresh_tokens(profile_config, directory, profile)
-    
-    if 'role_arn' not in profile_config:
-        print(f"Error: Profile '{profile}' is missing 'role_arn'. Please run 'ck-prism configure' again.")
+    if failed:
+        print(f"Failed to log in {len(failed)} of {len(profiles)} profiles: {', '.join(failed)}")
         exit(1)
 
-    get_aws_credentials(profile_config, tokens['access_token'], profile_config['role_arn'], profile, directory)
+def exchange_profiles(config, profiles, directory, max_workers=DEFAULT_MAX_WORKERS, interactive=True):
+    """Exchange credentials for many profiles concurrently.
 
-def get_or_refresh_tokens(config, directory, profile):
-    tokens_dir = os.path.join(directory, '.ck-prism', 'tokens')
-    os.makedirs(tokens_dir, exist_ok=True)
-    
-    token_file = os.path.join(tokens_dir, f'{profile}_tokens.json')
+    Tokens are fetched once per (login URL, realm, client) and shared by every
+    profile of that realm. Realms are logged in concurrently, so browser
+    logins to several tenants can be completed in any order, and a realm's
+    exchanges start as soon as its tokens arrive. Returns ``(results, failed)``
+    where ``results`` maps profile names to the ``(access_key, secret_key,
+    session_token, expiration)`` of normalize_credentials. A profile whose
+    login, exchange or response fails is reported by name and left out.
+    """
+    profile_configs = {profile: get_profile_config(config, profile) for profile in profiles}
+
+    realms = {}
+    for profile, profile_config in profile_configs.items():
+        key = (profile_config['keycloak_base_url'], profile_config['realm'], profile_config['client_id'])
+        realms.setdefault(key, []).append(profile)
+
+    def login(realm_profiles):
+        return get_or_refresh_tokens(profile_configs[realm_profiles[0]], directory, realm_profiles[0], interactive)
+
+    def exchange(profile, access_token):
+        profile_config = profile_configs[profile]
+        return normalize_credentials(exchange_credentials(profile_config, access_token, profile_config['role_arn']))
+
+    results = {}
+    failed = []
+    logged_in = {}
+    login_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(realms)))
+    exchange_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        logins = {login_executor.submit(login, realm_profiles): realm_profiles for realm_profiles in realms.values()}
+        exchanges = {}
+        for future in concurrent.futures.as_completed(logins):
+            realm_profiles = logins[future]
+            try:
+                tokens = future.result()
+            except PrismError as e:
+                # The realm could not be logged in; its profiles fail, the rest go ahead
+                print(e)
+                failed.extend(realm_profiles)
+                continue
+            for profile in realm_profiles:
+                logged_in[profile] = profile_configs[profile]
+                exchanges[exchange_executor.submit(exchange, profile, tokens['access_token'])] = profile
+
+        for future in concurrent.futures.as_completed(exchanges):
+            profile = exchanges[future]
+            try:
+                results[profile] = future.result()
+            except PrismError as e:
+                print(f'{profile}: {e}')
+                failed.append(profile)
+    except KeyboardInterrupt:
+        cancel_pending_logins('cancelled')
+        raise AuthenticationError('Authentication cancelled')
+    finally:
+        login_executor.shutdown()
+        exchange_executor.shutdown()
+
+    record_profile_tokens(directory, logged_in)
+    return results, sorted(failed)
+
+def get_token_file(config, directory):
+    """Token file shared by every profile on the same Prism login server, realm and client.
+
+    The server is the resolved ``keycloak_base_url``, so the file follows
+    the endpoint the tokens were issued by.
+    """
+    server = urllib.parse.urlsplit(config['keycloak_base_url'])
+    key = '_'.join([server.netloc + server.path.rstrip('/'), config['realm'], config['client_id']])
+    key = re.sub(r'[^A-Za-z0-9._-]', '-', key)
+    return os.path.join(directory, '.ck-prism', 'tokens', f'{key}_tokens.json')
+
+@traced('tokens')
+def get_or_refresh_tokens(config, directory, profile=None, interactive=True):
+    token_file = get_token_file(config, directory)
+    os.makedirs(os.path.dirname(token_file), exist_ok=True)
+
+    if profile:
+        migrate_profile_tokens(token_file, directory, profile)
     
-    # Try to load and refresh existing tokens
-    if os.path.exists(token_file):
-        with open(token_file, 'r') as f:
-            tokens = json.load(f)
-        
-        # Check if access token is still valid (with 5 min buffer)
-        if tokens.get('expires_at', 0) > time.time() + 300:
-            # print('Using cached access token') # Silent as per requirement "silently"
+    tokens = load_tokens(token_file)
+    if tokens_are_usable(config, tokens, directory):
+        return tokens
+    rejected = tokens
+
+    # Only one process refreshes or logs in; the others wait here and then
+    # pick up the tokens it saved instead of spending the same refresh token.
+    with file_lock(f'{token_file}.lock'):
+        tokens = load_tokens(token_file)
+        if tokens != rejected and tokens_are_usable(config, tokens, directory):
             return tokens
         
         # Try refresh
-        if tokens.get('refresh_token'):
-            print('Refreshing tokens...')
+        if tokens and tokens.get('refresh_token'):
+            progress('Refreshing tokens...')
             refreshed = refresh_tokens(config, tokens['refresh_token'])
             if refreshed:
                 save_tokens(token_file, refreshed)
                 return refreshed
-    
-    # Interactive login required
-    print('Performing interactive login...')
-    new_tokens = interactive_login(config)
-    save_tokens(token_file, new_tokens)
-    return new_tokens
+        
+        # Interactive login required
+        if not interactive:
+            raise LoginRequiredError(f"Login required for realm '{config['realm']}'. Run ck-prism login")
+        progress(f"Performing interactive login for realm '{config['realm']}'...")
+        new_tokens = interactive_login(config)
+        save_tokens(token_file, new_tokens)
+        return new_tokens
 
-def refresh_tokens(config, refresh_token):
-    token_url = f"{config['keycloak_base_url']}/realms/{config['realm']}/protocol/openid-connect/token"
-    
-    data = {
+def migrate_profile_tokens(token_file, directory, profile):
+    """Fold a pre-1.2 per-profile token file into the shared realm token file.
+
+    The newer of the two sessions is kept and the profile file is removed.
+    """
+    legacy_file = os.path.join(directory, '.ck-prism', 'tokens', f'{profile}_tokens.json')
+    if legacy_file == token_file or not os.path.exists(legacy_file):
+        return
+
+    with file_lock(f'{token_file}.lock'):
+        legacy = load_tokens(legacy_file)
+        if legacy is None:
+            return
+        current = load_tokens(token_file)
+        if not current or legacy.get('expires_at', 0) > current.get('expires_at', 0):
+            save_tokens(token_file, legacy)
+        try:
+            os.remove(legacy_file)
+        except FileNotFoundError:
+            pass
+
+def tokens_are_valid(tokens):
+    """True when the cached access token is valid for at least another 5 minutes."""
+    return bool(tokens) and tokens.get('expires_at', 0) > time.time() + TOKEN_MIN_TTL
+
+def tokens_are_usable(config, tokens, directory):
+    """tokens_are_valid, and the access token passes local JWT verification (see ck_jwt).
+
+    Verification is skipped for opaque tokens and when the profile sets
+    ``verify_tokens`` to false (or CK_PRISM_VERIFY_TOKENS=0). When the
+    realm's signing keys cannot be fetched the stored expiry decides.
+    """
+    if not tokens_are_valid(tokens):
+        return False
+    if not token_verification_enabled(config) or not is_jwt(tokens.get('access_token')):
+        return True
+    try:
+        verify_access_token(config, tokens['access_token'], directory, min_ttl=TOKEN_MIN_TTL)
+    except InvalidTokenError as e:
+        progress(f'Cached access token rejected: {e}')
+        return False
+    except PrismError as e:
+        progress(f'Could not verify the access token locally: {e}')
+    return True
+
+def token_verification_enabled(config):
+    value = config.get('verify_tokens')
+    if value is None:
+        value = os.environ.get('CK_PRISM_VERIFY_TOKENS', 'true')
+    if isinstance(value, str):
+        return value.strip().lower() not in ('0', 'false', 'no', 'off')
+    return bool(value)
+
+def load_tokens(token_file):
+    """Read a token file, returning None when it is missing or unreadable."""
+    try:
+        with open(token_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        progress(f'Ignoring unreadable token file {token_file}')
+        return None
+
+def get_token_url(config):
+    return f"{config['keycloak_base_url']}/realms/{config['realm']}/protocol/openid-connect/token"
+
+def build_refresh_request(config, refresh_token):
+    """Form data of a refresh_token grant, as sent by refresh_tokens."""
+    return {
         'grant_type': 'refresh_token',
         'client_id': config['client_id'],
         'refresh_token': refresh_token
     }
-    
+
+def build_exchange_request(config, access_token, role_arn=None):
+    """``(headers, payload)`` of an /exchange call; without ``role_arn`` it lists the realm's roles."""
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    payload = {
+        'token': access_token,
+        'realm': config['realm']
+    }
+    if role_arn:
+        payload['selected_role'] = role_arn
+    return headers, payload
+
+@traced('tokens.refresh')
+def refresh_tokens(config, refresh_token):
+    # A hedged copy spends the same refresh token a second time, which realms
+    # that rotate or revoke refresh tokens reject; profiles opt in explicitly
+    hedge_after = None if config.get('hedge_token_refresh') else 0
     try:
-        response = requests.post(token_url, data=data, timeout=30)
+        response = ck_http.hedged_post(get_token_url(config), hedge_after=hedge_after,
+                                       data=build_refresh_request(config, refresh_token))
         if response.status_code == 200:
-            token_data = response.json()
-            return {
-                'access_token': token_data['access_token'],
-                'refresh_token': token_data.get('refresh_token', refresh_token),
-                'id_token': token_data.get('id_token'),
-                'expires_at': time.time() + token_data.get('expires_in', 300)
-            }
+            return build_tokens(response.json(), refresh_token)
     except Exception as e:
-        print(f'Token refresh failed: {e}')
+        progress(f'Token refresh failed: {e}')
     return None
 
+def get_login_timeout(config, silent=False):
+    """Seconds to wait for the browser redirect: profile ``login_timeout``, then CK_PRISM_LOGIN_TIMEOUT.
+
+    Silent logins use ``silent_login_timeout`` / CK_PRISM_SILENT_LOGIN_TIMEOUT instead.
+    """
+    if silent:
+        setting, variable, default = 'silent_login_timeout', 'CK_PRISM_SILENT_LOGIN_TIMEOUT', DEFAULT_SILENT_LOGIN_TIMEOUT
+    else:
+        setting, variable, default = 'login_timeout', 'CK_PRISM_LOGIN_TIMEOUT', DEFAULT_LOGIN_TIMEOUT
+    value = config.get(setting) or os.environ.get(variable) or default
+    try:
+        return max(1.0, float(value))
+    except ValueError:
+        return float(default)
+
+def get_login_prompts(config):
+    """OIDC ``prompt`` values to try in turn: profile ``login_prompt``, then CK_PRISM_LOGIN_PROMPT."""
+    value = config.get('login_prompt') or os.environ.get('CK_PRISM_LOGIN_PROMPT') or 'auto'
+    if value not in LOGIN_PROMPTS:
+        raise ConfigurationError(f"Invalid login_prompt '{value}'. Use one of: {', '.join(LOGIN_PROMPTS)}")
+    return ['none', 'consent'] if value == 'auto' else [value]
+
+@traced('tokens.interactive_login')
 def interactive_login(config):
+    """Log in through the browser, silently first when the profile allows it.
+
+    With ``login_prompt`` ``auto`` a ``prompt=none`` request completes without
+    any interaction while the browser still has an SSO session; when it
+    cannot, the full consent login follows on the same callback server.
+    """
+    prompts = get_login_prompts(config)
+    server = acquire_callback_server()
+    try:
+        for attempt, prompt in enumerate(prompts):
+            try:
+                code, code_verifier = authorize(config, server, prompt)
+                break
+            except LoginRequiredError as e:
+                if attempt == len(prompts) - 1:
+                    raise
+                progress(f'{e}; continuing with a full login')
+    finally:
+        release_callback_server()
+    redirect_uri = server.redirect_uri
+    
+    # Exchange code for tokens
+    data = {
+        'grant_type': 'authorization_code',
+        'client_id': config['client_id'],
+        'code': code,
+        'redirect_uri': redirect_uri,
+        'code_verifier': code_verifier
+    }
+    
+    try:
+        response = ck_http.post(get_token_url(config), retry=False, data=data)
+    except requests.exceptions.RequestException as e:
+        raise PrismConnectionError(f'Error connecting to Prism: {e}')
+    if response.status_code != 200:
+        raise AuthenticationError(f'Token exchange failed: {response.text}')
+    
+    token_data = response.json()
+    progress('Authentication successful!')
+    
+    return build_tokens(token_data)
+
+def authorize(config, server, prompt):
+    """Run one authorization request through ``server``; returns ``(code, code_verifier)``."""
     # Generate PKCE challenge
     code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(64)).decode('utf-8').rstrip('=' )
     code_verifier = ''.join(c for c in code_verifier if c.isalnum() or c in '-._~')[:128]
@@ -150,12 +377,35 @@ def interactive_login(config):
     
     state = secrets.token_hex(16)
     
-    # Start callback server
-    code_result = {'code': None, 'error': None}
-    server, port = start_callback_server(state, code_result)
-    
-    redirect_uri = f'http://127.0.0.1:{port}/cb'
-    
+    # Wait for the redirect on the callback server shared by concurrent logins
+    code_result = server.register(state)
+    try:
+        code = wait_for_authorization(config, server.redirect_uri, state, code_challenge, code_result, prompt)
+    finally:
+        server.unregister(state)
+    return code, code_verifier
+
+def build_tokens(token_data, refresh_token=None):
+    """Turn a token endpoint response into the cached token format."""
+    now = time.time()
+    refresh_expires_in = token_data.get('refresh_expires_in')
+    return {
+        'access_token': token_data['access_token'],
+        'refresh_token': token_data.get('refresh_token', refresh_token),
+        'id_token': token_data.get('id_token'),
+        'expires_at': now + token_data.get('expires_in', 300),
+        # Keycloak reports 0 for offline sessions, which do not expire on a timer
+        'refresh_expires_at': now + refresh_expires_in if refresh_expires_in else None
+    }
+
+@traced('tokens.browser_wait')
+def wait_for_authorization(config, redirect_uri, state, code_challenge, code_result, prompt='consent'):
+    """Open the browser and block until the callback server receives the redirect.
+
+    Returns the authorization code. A silent (``prompt=none``) request that
+    the identity provider cannot complete raises LoginRequiredError.
+    """
+    silent = prompt == 'none'
     # Build auth URL
     auth_params = {
         'response_type': 'code',
@@ -165,138 +415,114 @@ def interactive_login(config):
         'code_challenge': code_challenge,
         'code_challenge_method': 'S256',
         'state': state,
-        'prompt': 'consent'
+        'prompt': prompt
     }
     
     auth_url = f"{config['keycloak_base_url']}/realms/{config['realm']}/protocol/openid-connect/auth?" + urllib.parse.urlencode(auth_params)
     
-    print('\nOpening browser for authentication...')
-    open_browser(auth_url)
-    print(f'\nIf browser did not open, visit:\n{auth_url}\n')
-    
-    # Wait for callback
-    print('Waiting for authentication...')
-    for _ in range(180):
-        if code_result['code'] or code_result['error']:
-            break
-        time.sleep(1)
-    
-    server.shutdown()
-    
+    if silent:
+        progress(f"Trying silent login to realm '{config['realm']}' with the browser's session...")
+        if not open_browser(auth_url):
+            raise LoginRequiredError('Silent login skipped: the browser could not be opened')
+    else:
+        print(f"\nOpening browser for authentication to realm '{config['realm']}'...")
+        open_browser(auth_url)
+        print(f'\nIf browser did not open, visit:\n{auth_url}\n')
+        progress('Waiting for authentication...')
+    
+    # Wait for callback. The handler sets the event as soon as the redirect
+    # arrives; waiting in short slices keeps Ctrl-C responsive on Windows.
+    deadline = time.time() + get_login_timeout(config, silent)
+    try:
+        while not code_result['done'].is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            code_result['done'].wait(min(remaining, 1))
+    except KeyboardInterrupt:
+        raise AuthenticationError('Authentication cancelled')
+    
+    if code_result['cancelled']:
+        raise AuthenticationError('Authentication cancelled')
+
     if code_result['error']:
-        print(f"Authentication failed: {code_result['error']}")
-        exit(1)
+        if silent:
+            raise LoginRequiredError(f"Silent login failed: {code_result['error']}")
+        raise AuthenticationError(f"Authentication failed: {code_result['error']}")
     
     if not code_result['code']:
-        print('Authentication timed out')
-        exit(1)
-    
-    # Exchange code for tokens
-    token_url = f"{config['keycloak_base_url']}/realms/{config['realm']}/protocol/openid-connect/token"
-    
-    data = {
-        'grant_type': 'authorization_code',
-        'client_id': config['client_id'],
-        'code': code_result['code'],
-        'redirect_uri': redirect_uri,
-        'code_verifier': code_verifier
-    }
-    
-    response = requests.post(token_url, data=data, timeout=30)
-    if response.status_code != 200:
-        print(f'Token exchange failed: {response.text}')
-        exit(1)
-    
-    token_data = response.json()
-    print('Authentication successful!')
-    
-    return {
-        'access_token': token_data['access_token'],
-        'refresh_token': token_data.get('refresh_token'),
-        'id_token': token_data.get('id_token'),
-        'expires_at': time.time() + token_data.get('expires_in', 300)
-    }
+        if silent:
+            raise LoginRequiredError('Silent login timed out')
+        raise AuthenticationError('Authentication timed out')
 
-def start_callback_server(expected_state, result):
-    class CallbackHandler(http.server.BaseHTTPRequestHandler):
-        def do_GET(self):
-            parsed = urllib.parse.urlparse(self.path)
-            if parsed.path != '/cb':
-                self.send_response(404)
-                self.end_headers()
-                return
-            
-            params = urllib.parse.parse_qs(parsed.query)
-            code = params.get('code', [None])[0]
-            state = params.get('state', [None])[0]
-            error = params.get('error', [None])[0]
-            
-            if error:
-                result['error'] = error
-                self.send_response(400)
-                self.send_header('Content-Type', 'text/html')
-                self.end_headers()
-                self.wfile.write(b'<html><body><h3>Authentication failed</h3></body></html>')
-                return
-            
-            if not code or state != expected_state:
-                result['error'] = 'Invalid state or missing code'
-                self.send_response(400)
-                self.end_headers()
-                return
-            
-            result['code'] = code
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(b'<html><body><h3>Login complete!</h3><p>You can close this tab.</p></body></html>')
-        
-        def log_message(self, *args, **kwargs):
-            pass
-    
-    class ReusableTCPServer(socketserver.TCPServer):
-        allow_reuse_address = True
-    
-    server = ReusableTCPServer(('127.0.0.1', 0), CallbackHandler)
-    port = server.server_address[1]
-    
-    thread = threading.Thread(target=server.serve_forever, daemon=True)
-    thread.start()
-    
-    return server, port
+    return code_result['code']
 
 def open_browser(url):
+    """Open ``url`` in the default browser; False when no browser could be launched."""
     try:
         if sys.platform.startswith('linux'):
-            subprocess.run(['xdg-open', url], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            result = subprocess.run(['xdg-open', url], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return result.returncode == 0
         elif sys.platform.startswith('darwin'):
-            subprocess.run(['open', url], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            result = subprocess.run(['open', url], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return result.returncode == 0
         elif sys.platform.startswith('win'):
             os.startfile(url)
+            return True
     except:
         pass
+    return False
 
+@traced('tokens.save')
 def save_tokens(token_file, tokens):
-    with open(token_file, 'w') as f:
-        json.dump(tokens, f, indent=2)
-    os.chmod(token_file, 0o600)
+    atomic_write(token_file, json.dumps(tokens, indent=2), mode=0o600)
+    record_tokens(token_file, tokens)
 
-def fetch_available_roles(config, access_token):
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'token': access_token,
-        'realm': config['realm']
-    }
+def record_profile_tokens(directory, profile_configs):
+    """Note in the status index which token file each profile uses."""
+    index = load_status_index(directory)
+    changed = {}
+    for profile, profile_config in profile_configs.items():
+        token_file = get_token_file(profile_config, directory)
+        token = os.path.basename(token_file)
+        if index['profiles'].get(profile, {}).get('token') != token:
+            changed[profile] = {'token': token}
+        if token not in index['tokens']:
+            # Token files saved before the index existed
+            tokens = load_tokens(token_file)
+            if tokens:
+                record_tokens(token_file, tokens)
+                index['tokens'][token] = {}
+    if changed:
+        update_status_index(directory, profiles=changed)
+
+@traced('fetch_roles')
+def fetch_available_roles(config, access_token, directory=None, refresh=False):
+    """Return ``(roles, account_names)`` for the realm.
+
+    When ``directory`` is given the catalog is cached per realm in the
+    profile store (see ck_store) and reused for ROLE_CATALOG_TTL seconds; after that
+    it is revalidated with If-None-Match. ``refresh`` forces a full download.
+    """
+    store = get_store(directory) if directory else None
+    cached = store.load_role_catalog(config) if store and not refresh else None
+
+    if cached and cached['fetched_at'] + ROLE_CATALOG_TTL > time.time():
+        return cached['roles'], cached['account_names']
+
+    headers, payload = build_exchange_request(config, access_token)
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
     
     try:
-        response = requests.post(config['api_endpoint'], json=payload, headers=headers, timeout=30)
+        response = ck_http.post(config['api_endpoint'], json=payload, headers=headers)
+        if cached and response.status_code == 304:
+            cached['fetched_at'] = time.time()
+            store.store_role_catalog(config, cached)
+            return cached['roles'], cached['account_names']
+
         if response.status_code != 200:
-            print(f'Failed to fetch available roles: {response.text}')
-            exit(1)
+            raise ApiError(f'Failed to fetch available roles: {response.text}', response.status_code, response.text)
         
         roles_data = response.json()
         
@@ -308,104 +534,92 @@ def fetch_available_roles(config, access_token):
         elif isinstance(roles_data, list):
             roles = roles_data
         else:
-            print(f'Unexpected response format: {roles_data}')
-            exit(1)
+            raise ApiError(f'Unexpected response format: {roles_data}', response.status_code, response.text)
         
         # Extract account names if present
         account_names = {}
         if isinstance(roles_data, dict) and 'account_names' in roles_data and isinstance(roles_data['account_names'], dict):
             account_names = roles_data['account_names']
+
+        if store:
+            store.store_role_catalog(config, {
+                'fetched_at': time.time(),
+                'etag': response.headers.get('ETag'),
+                'roles': roles,
+                'account_names': account_names
+            })
         
         return roles, account_names
             
     except requests.exceptions.RequestException as e:
-        print(f'Error connecting to API: {e}')
-        exit(1)
+        raise PrismConnectionError(f'Error connecting to API: {e}')
+    except ValueError as e:
+        raise ApiError(f'Error fetching available roles: {e}')
 
 def get_aws_credentials(config, access_token, role_arn, profile, directory):
-    print(f'Exchanging token for AWS credentials for role: {role_arn}...')
-    
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
+    creds = exchange_credentials(config, access_token, role_arn)
+    write_aws_credentials(creds, profile, directory, config['region'])
+
+@traced('exchange')
+def exchange_credentials(config, access_token, role_arn):
+    """Exchange a Prism access token for the AWS credentials of a role."""
+    progress(f'Exchanging token for AWS credentials for role: {role_arn}...')
     
-    creds_payload = {
-        'token': access_token,
-        'realm': config['realm'],
-        'selected_role': role_arn
-    }
+    headers, payload = build_exchange_request(config, access_token, role_arn)
     
     try:
-        response = requests.post(config['api_endpoint'], json=creds_payload, headers=headers, timeout=30)
+        response = ck_http.post(config['api_endpoint'], json=payload, headers=headers)
         if response.status_code != 200:
-            print(f'AWS credential exchange failed: {response.text}')
-            exit(1)
+            raise ApiError(f'AWS credential exchange failed: {response.text}', response.status_code, response.text)
         
-        creds = response.json()
-        write_aws_credentials(creds, profile, directory, config['region'])
+        return response.json()
         
     except requests.exceptions.RequestException as e:
-        print(f'Error connecting to API: {e}')
-        exit(1)
-    except Exception as e:
-        print(f'Error exchanging credentials: {e}')
-        exit(1)
+        raise PrismConnectionError(f'Error connecting to API: {e}')
+    except ValueError as e:
+        raise ApiError(f'Error exchanging credentials: {e}')
 
 def write_aws_credentials(creds, profile, directory, region):
-    credentials_path = os.path.join(directory, '.aws', 'credentials')
-    config_path = os.path.join(directory, '.aws', 'config')
-    os.makedirs(os.path.dirname(credentials_path), exist_ok=True)
+    write_aws_credentials_batch([(profile, normalize_credentials(creds), region)], directory)
 
-    # Handle nested credentials structure
-    if 'credentials' in creds:
-        creds = creds['credentials']
-    
-    # Handle both snake_case and PascalCase key formats
-    access_key = creds.get('access_key_id') or creds.get('AccessKeyId')
-    secret_key = creds.get('secret_access_key') or creds.get('SecretAccessKey')
-    session_token = creds.get('session_token') or creds.get('SessionToken')
-    expiration = creds.get('expiration') or creds.get('Expiration')
-    
-    if not access_key or not secret_key or not session_token:
-        print(f'Error: Invalid credentials format received: {creds}')
-        exit(1)
+@traced('write_aws_files')
+def write_aws_credentials_batch(entries, directory):
+    """Write ``(profile, credentials, region)`` entries to the AWS files with one write per file.
 
-    # Write credentials
-    parser = configparser.ConfigParser()
-    parser.read(credentials_path)
+    ``credentials`` is the tuple returned by normalize_credentials. Only the
+    sections of the given profiles are touched; see update_ini_file.
+    """
+    normalized = list(entries)
 
-    new_creds = {
-        'aws_access_key_id': access_key,
-        'aws_secret_access_key': secret_key,
-        'aws_session_token': session_token
-    }
+    credentials_sections = {}
+    config_sections = {}
+    for profile, (access_key, secret_key, session_token, _), region in normalized:
+        credentials_sections[profile] = {
+            'aws_access_key_id': access_key,
+            'aws_secret_access_key': secret_key,
+            'aws_session_token': session_token
+        }
+        config_sections[get_config_section(profile)] = {
+            'region': region,
+            'output': 'json'
+        }
 
-    if parser.has_section(profile):
-        parser.remove_section(profile)
+    update_ini_file(get_aws_credentials_path(directory), credentials_sections)
+    update_ini_file(get_aws_config_path(directory), config_sections)
 
-    parser[profile] = new_creds
+    now = time.time()
+    update_status_index(directory, profiles={
+        profile: {'credentials_expire_at': parse_expiration(creds[3]), 'updated_at': now}
+        for profile, creds, _ in normalized
+    })
 
-    with open(credentials_path, 'w') as f:
-        parser.write(f)
-    
-    # Write config
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_path)
-    
-    profile_key = f'profile {profile}' if profile != 'default' else profile
-    
-    if not config_parser.has_section(profile_key):
-        config_parser[profile_key] = {}
-    
-    config_parser[profile_key]['region'] = region
-    config_parser[profile_key]['output'] = 'json'
-    
-    with open(config_path, 'w') as f:
-        config_parser.write(f)
+    if len(normalized) > 1:
+        print(f'\nAWS credentials for {len(normalized)} profiles written to ~/.aws/credentials')
+        return
 
+    expiration = normalized[0][1][3]
     print(f'\nAWS credentials written to ~/.aws/credentials')
     if expiration:
         print(f'Credentials expire at: {expiration}')
     else:
-        print(f'Credentials expire at: {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() + 3600))}')
\ No newline at end of file
+        print('Credentials expire at: unknown (not reported by Prism)')
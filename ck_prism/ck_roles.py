@@ -0,0 +1,112 @@
+import sys
+
+# Compact, indexed view of a realm's role catalog. Tenants can have thousands
+# of accounts, so roles are parsed once into slotted records and the lookups
+# used by configure (by account, by ARN, by account and role name, search)
+# are precomputed.
+
+class RoleRecord:
+    """One role of the catalog. ``full_arn`` is what the exchange expects."""
+
+    __slots__ = ('account_id', 'name', 'role_arn', 'full_arn')
+
+    def __init__(self, account_id, name, role_arn, full_arn):
+        self.account_id = account_id
+        self.name = name
+        self.role_arn = role_arn
+        self.full_arn = full_arn
+
+    def __repr__(self):
+        return f'RoleRecord({self.account_id!r}, {self.name!r})'
+
+def parse_role(role):
+    """Build a RoleRecord from a catalog entry, or None if it is not a role ARN.
+
+    Entries are ``{role_arn},{idp_arn}`` strings, bare role ARNs, or dicts
+    with a ``role_arn`` or ``arn`` key.
+    """
+    if isinstance(role, dict):
+        full_arn = role.get('role_arn', role.get('arn', str(role)))
+    else:
+        full_arn = str(role)
+    role_arn = full_arn.partition(',')[0]
+
+    # arn:aws:iam::ACCOUNT_ID:role/ROLE_NAME
+    parts = role_arn.split(':', 5)
+    if len(parts) < 6 or not parts[5].startswith('role/'):
+        return None
+    return RoleRecord(sys.intern(parts[4]), parts[5][len('role/'):], role_arn, full_arn)
+
+class RoleIndex:
+    """Roles of a realm grouped by account, with name lookups and search."""
+
+    def __init__(self, roles, account_names=None):
+        self.account_names = account_names or {}
+        self._by_account = {}
+        self._by_arn = {}
+        self._by_name = {}
+        for role in roles:
+            record = parse_role(role)
+            if record is None:
+                continue
+            self._by_account.setdefault(record.account_id, []).append(record)
+            self._by_arn[record.role_arn] = record
+            self._by_name[(record.account_id, record.name)] = record
+
+        self._by_account = {account_id: tuple(records) for account_id, records in self._by_account.items()}
+        self._accounts = sorted(self._by_account)
+        # Lower-cased search text per account: its id and its name
+        self._account_keys = [(account_id, (self.account_names.get(account_id) or '').lower())
+                              for account_id in self._accounts]
+
+    def __len__(self):
+        return len(self._by_arn)
+
+    def __iter__(self):
+        for account_id in self._accounts:
+            yield from self._by_account[account_id]
+
+    def accounts(self):
+        """Account ids, sorted."""
+        return list(self._accounts)
+
+    def roles(self, account_id):
+        """Roles of an account, in catalog order."""
+        return self._by_account.get(account_id, ())
+
+    def find(self, role_arn):
+        """Role by ARN; the ``,{idp_arn}`` suffix is ignored."""
+        return self._by_arn.get(role_arn.partition(',')[0])
+
+    def get(self, account_id, role_name):
+        return self._by_name.get((account_id, role_name))
+
+    def search_accounts(self, query=''):
+        """Account ids whose id or name matches ``query``: prefix matches first, then substrings."""
+        query = query.strip().lower()
+        if not query:
+            return list(self._accounts)
+
+        prefix = []
+        substring = []
+        for account_id, name in self._account_keys:
+            if account_id.startswith(query) or name.startswith(query):
+                prefix.append(account_id)
+            elif query in account_id or query in name:
+                substring.append(account_id)
+        return prefix + substring
+
+    def search_roles(self, account_id, query=''):
+        """Roles of an account whose name matches ``query``: prefix matches first, then substrings."""
+        roles = self.roles(account_id)
+        query = query.strip().lower()
+        if not query:
+            return list(roles)
+
+        prefix = [role for role in roles if role.name.lower().startswith(query)]
+        substring = [role for role in roles if query in role.name.lower() and not role.name.lower().startswith(query)]
+        return prefix + substring
+
+    def describe_account(self, account_id):
+        name = self.account_names.get(account_id)
+        return f'{account_id} ({name})' if name else account_id
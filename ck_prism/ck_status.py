@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+
+# Offline view of token and credential expiry, served from a small index kept
+# up to date by save_tokens and write_aws_credentials. `ck-prism status` only
+# reads this file, so it is cheap enough for shell prompts and hooks.
+
+def load_status_index(directory):
+    from ck_prism.ck_store import get_store
+    return get_store(directory).load_status_index()
+
+def update_status_index(directory, tokens=None, profiles=None):
+    """Merge token entries (keyed by token file name) and profile entries into the index."""
+    from ck_prism.ck_store import get_store
+    get_store(directory).update_status_index(tokens=tokens, profiles=profiles)
+
+def record_tokens(token_file, tokens):
+    directory = os.path.dirname(os.path.dirname(os.path.dirname(token_file)))
+    update_status_index(directory, tokens={os.path.basename(token_file): {
+        'expires_at': tokens.get('expires_at'),
+        'refresh_expires_at': tokens.get('refresh_expires_at'),
+        'updated_at': time.time()
+    }})
+
+def status_utility():
+    from ck_prism.ck_common import get_home_directory
+
+    profile = None
+    as_json = False
+    args = sys.argv[2:]
+    while args:
+        arg = args.pop(0)
+        if arg == '--json':
+            as_json = True
+        elif arg == '--profile' and args:
+            profile = args.pop(0)
+        else:
+            print(f'Invalid flag {arg}. Acceptable flags are --profile PROFILE_NAME and --json.')
+            exit(1)
+
+    index = load_status_index(get_home_directory())
+    now = time.time()
+
+    rows = []
+    for name in sorted(index['profiles']):
+        if profile and name != profile:
+            continue
+        entry = index['profiles'][name]
+        token = index['tokens'].get(entry.get('token'), {})
+        rows.append({
+            'profile': name,
+            'token_expires_at': token.get('expires_at'),
+            'refresh_expires_at': token.get('refresh_expires_at'),
+            'credentials_expire_at': entry.get('credentials_expire_at'),
+            'credentials_valid': bool(entry.get('credentials_expire_at')) and entry['credentials_expire_at'] > now
+        })
+
+    if profile and not rows:
+        print(f'No status recorded for profile {profile}. Run ck-prism login --profile {profile}')
+        exit(1)
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+    elif not rows:
+        print('No profiles have logged in yet. Run ck-prism login')
+    else:
+        print(f"{'PROFILE':<32} {'ACCESS TOKEN':<16} {'SESSION':<16} {'AWS CREDENTIALS':<16}")
+        for row in rows:
+            print(f"{row['profile']:<32} {format_expiry(row['token_expires_at'], now):<16} "
+                  f"{format_expiry(row['refresh_expires_at'], now):<16} {format_expiry(row['credentials_expire_at'], now):<16}")
+
+    # With --profile the exit status tells hooks whether credentials are usable
+    if profile and not rows[0]['credentials_valid']:
+        exit(1)
+
+def format_expiry(expires_at, now):
+    if not expires_at:
+        return '-'
+    remaining = expires_at - now
+    if remaining <= 0:
+        return f'expired {format_duration(-remaining)} ago'
+    return f'in {format_duration(remaining)}'
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f'{int(seconds)}s'
+    if seconds < 3600:
+        return f'{int(seconds // 60)}m'
+    if seconds < 86400:
+        return f'{int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m'
+    return f'{int(seconds // 86400)}d'
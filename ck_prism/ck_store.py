@@ -0,0 +1,301 @@
+import os
+import json
+import threading
+import contextlib
+import collections.abc
+from ck_prism.ck_errors import ConfigurationError
+
+# Where ck-prism keeps profiles, token metadata and role catalogs.
+#
+# The default JSON store is ~/.ck-prism/config.json plus the status index and
+# role catalog cache files. The SQLite store keeps all three in
+# ~/.ck-prism/config.db (WAL mode) and gives O(1) profile lookups and
+# transactional updates, for installations with thousands of profiles. It is
+# used when config.db exists or CK_PRISM_STORE=sqlite, and imports the JSON
+# files the first time it is opened. Like ck_common, this module must stay
+# light: sqlite3 is only imported when the SQLite store is in use.
+
+STORE_ENV = 'CK_PRISM_STORE'
+# Seconds a writer waits for another process to finish its transaction
+SQLITE_BUSY_TIMEOUT = 30
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_config_dir(directory):
+    return os.path.join(directory, '.ck-prism')
+
+def get_config_path(directory):
+    return os.path.join(get_config_dir(directory), 'config.json')
+
+def get_database_path(directory):
+    return os.path.join(get_config_dir(directory), 'config.db')
+
+def get_status_index_path(directory):
+    return os.path.join(get_config_dir(directory), 'status.json')
+
+def get_store(directory):
+    """Return the store for ``directory``, chosen by CK_PRISM_STORE or an existing config.db."""
+    kind = os.environ.get(STORE_ENV, '').strip().lower()
+    if kind not in ('', 'json', 'sqlite'):
+        raise ConfigurationError(f'Invalid {STORE_ENV} value {kind!r}. Acceptable values are json and sqlite.')
+    use_sqlite = kind == 'sqlite' or (not kind and os.path.exists(get_database_path(directory)))
+
+    key = (directory, use_sqlite)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = SqliteStore(directory) if use_sqlite else JsonStore(directory)
+            _stores[key] = store
+    return store
+
+def _merge_status(index, tokens, profiles):
+    for key, entry in (tokens or {}).items():
+        index['tokens'].setdefault(key, {}).update(entry)
+    for profile, entry in (profiles or {}).items():
+        index['profiles'].setdefault(profile, {}).update(entry)
+
+class JsonStore:
+    """Profiles in config.json, updated under a lock file and replaced atomically."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.config_path = get_config_path(directory)
+        self.status_path = get_status_index_path(directory)
+
+    def read_config(self):
+        """Return the parsed config.json, None when it does not exist.
+
+        A corrupt file raises ConfigurationError rather than reading as an
+        empty configuration, so that saving a profile never wipes the others.
+        """
+        try:
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            raise ConfigurationError(f'Configuration file {self.config_path} is invalid ({e}). Fix or remove it, then run ck-prism configure')
+        if not isinstance(config, dict):
+            raise ConfigurationError(f'Configuration file {self.config_path} is invalid (expected an object of profiles). Fix or remove it, then run ck-prism configure')
+        return config
+
+    def profiles(self):
+        return self.read_config()
+
+    def save_profiles(self, profiles, remove=()):
+        """Add or replace ``profiles`` and delete ``remove``, keeping every other profile."""
+        from ck_prism.ck_files import file_lock, atomic_write
+
+        with file_lock(f'{self.config_path}.lock'):
+            config = self.read_config() or {}
+            config.update(profiles)
+            for name in remove:
+                config.pop(name, None)
+            atomic_write(self.config_path, json.dumps(config, indent=2))
+
+    def load_role_catalog(self, config):
+        from ck_prism.ck_cache import get_role_catalog_file, load_role_catalog
+        return load_role_catalog(get_role_catalog_file(self.directory, config))
+
+    def store_role_catalog(self, config, catalog):
+        from ck_prism.ck_cache import get_role_catalog_file, store_role_catalog
+        store_role_catalog(get_role_catalog_file(self.directory, config), catalog)
+
+    def load_status_index(self):
+        try:
+            with open(self.status_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault('tokens', {})
+        index.setdefault('profiles', {})
+        return index
+
+    def update_status_index(self, tokens=None, profiles=None):
+        from ck_prism.ck_files import file_lock, atomic_write
+
+        with file_lock(f'{self.status_path}.lock'):
+            index = self.load_status_index()
+            _merge_status(index, tokens, profiles)
+            atomic_write(self.status_path, json.dumps(index, indent=2, sort_keys=True))
+
+# PRAGMA user_version once the schema exists and the JSON files are imported
+SCHEMA_VERSION = 1
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS profiles (name TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS role_catalogs (realm TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS token_status (token TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS profile_status (name TEXT PRIMARY KEY, data TEXT NOT NULL)',
+]
+
+class SqliteStore:
+    """Profiles, token metadata and role catalogs in ~/.ck-prism/config.db."""
+
+    def __init__(self, directory):
+        import sqlite3
+
+        self.directory = directory
+        self.path = get_database_path(directory)
+        os.makedirs(get_config_dir(directory), exist_ok=True)
+        if not os.path.exists(self.path):
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+
+        # One connection shared by the threads of a multi-profile login;
+        # autocommit mode so that transactions are explicit
+        self._db = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT,
+                                   isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            # Plain reads, so that opening an initialized database never waits
+            # for another process's write transaction
+            if self._db.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                self._db.execute('PRAGMA journal_mode=WAL')
+            if self._schema_version() < SCHEMA_VERSION:
+                self._initialize()
+
+    def _schema_version(self):
+        return self._db.execute('PRAGMA user_version').fetchone()[0]
+
+    def _initialize(self):
+        """Create the tables and import the JSON files, once per database."""
+        with self.transaction() as db:
+            if self._schema_version() >= SCHEMA_VERSION:
+                return
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._import_json(db)
+            db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the block in a write transaction (BEGIN IMMEDIATE) on the shared connection."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                if self._db.in_transaction:
+                    self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _import_json(self, db):
+        """Copy config.json, the status index and cached role catalogs in, once."""
+        if db.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return
+
+        json_store = JsonStore(self.directory)
+        config = json_store.read_config() or {}
+        # Rows already in the database win over the JSON files
+        db.executemany('INSERT OR IGNORE INTO profiles (name, data) VALUES (?, ?)',
+                       [(name, json.dumps(profile)) for name, profile in config.items()])
+
+        index = json_store.load_status_index()
+        db.executemany('INSERT OR IGNORE INTO token_status (token, data) VALUES (?, ?)',
+                       [(key, json.dumps(entry)) for key, entry in index['tokens'].items()])
+        db.executemany('INSERT OR IGNORE INTO profile_status (name, data) VALUES (?, ?)',
+                       [(key, json.dumps(entry)) for key, entry in index['profiles'].items()])
+
+        from ck_prism.ck_cache import load_role_catalog
+        catalog_dir = os.path.join(get_config_dir(self.directory), 'cache', 'roles')
+        for file_name in (os.listdir(catalog_dir) if os.path.isdir(catalog_dir) else []):
+            catalog = load_role_catalog(os.path.join(catalog_dir, file_name))
+            if catalog and file_name.endswith('.json'):
+                db.execute('INSERT OR IGNORE INTO role_catalogs (realm, data) VALUES (?, ?)',
+                           (file_name[:-len('.json')], json.dumps(catalog)))
+
+        db.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (str(len(config)),))
+
+    def profiles(self):
+        """Mapping of profile name to settings, looked up by primary key on access."""
+        if not self._query('SELECT 1 FROM profiles LIMIT 1'):
+            return None
+        return ProfilesView(self)
+
+    def get_profile(self, name):
+        rows = self._query('SELECT data FROM profiles WHERE name = ?', (name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save_profiles(self, profiles, remove=()):
+        with self.transaction() as db:
+            db.executemany('INSERT OR REPLACE INTO profiles (name, data) VALUES (?, ?)',
+                           [(name, json.dumps(profile)) for name, profile in profiles.items()])
+            db.executemany('DELETE FROM profiles WHERE name = ?', [(name,) for name in remove])
+
+    def load_role_catalog(self, config):
+        from ck_prism.ck_cache import get_realm_digest
+
+        rows = self._query('SELECT data FROM role_catalogs WHERE realm = ?', (get_realm_digest(config),))
+        if not rows:
+            return None
+        catalog = json.loads(rows[0][0])
+        catalog.setdefault('account_names', {})
+        catalog.setdefault('fetched_at', 0)
+        return catalog
+
+    def store_role_catalog(self, config, catalog):
+        from ck_prism.ck_cache import get_realm_digest
+
+        with self.transaction() as db:
+            db.execute('INSERT OR REPLACE INTO role_catalogs (realm, data) VALUES (?, ?)',
+                       (get_realm_digest(config), json.dumps(catalog)))
+
+    def load_status_index(self):
+        return {
+            'tokens': {key: json.loads(data) for key, data in self._query('SELECT token, data FROM token_status')},
+            'profiles': {key: json.loads(data) for key, data in self._query('SELECT name, data FROM profile_status')}
+        }
+
+    def update_status_index(self, tokens=None, profiles=None):
+        with self.transaction() as db:
+            for table, column, entries in (('token_status', 'token', tokens), ('profile_status', 'name', profiles)):
+                for key, entry in (entries or {}).items():
+                    row = db.execute(f'SELECT data FROM {table} WHERE {column} = ?', (key,)).fetchone()
+                    merged = json.loads(row[0]) if row else {}
+                    merged.update(entry)
+                    db.execute(f'INSERT OR REPLACE INTO {table} ({column}, data) VALUES (?, ?)',
+                               (key, json.dumps(merged)))
+
+class ProfilesView(collections.abc.Mapping):
+    """Read-only dict-like view of the profiles table; rows are fetched on demand."""
+
+    def __init__(self, store):
+        self._store = store
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            profile = self._store.get_profile(name)
+            if profile is None:
+                raise KeyError(name)
+            self._cache[name] = profile
+        return self._cache[name]
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter([name for name, in self._store._query('SELECT name FROM profiles ORDER BY name')])
+
+    def __len__(self):
+        return self._store._query('SELECT COUNT(*) FROM profiles')[0][0]
+
+    def __bool__(self):
+        return bool(self._store._query('SELECT 1 FROM profiles LIMIT 1'))
+
+    def items(self):
+        rows = self._store._query('SELECT name, data FROM profiles ORDER BY name')
+        self._cache.update((name, json.loads(data)) for name, data in rows)
+        return [(name, self._cache[name]) for name, _ in rows]
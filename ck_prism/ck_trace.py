@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import contextlib
+
+# Recorded spans while tracing is enabled, None otherwise
+_spans = None
+_lock = threading.Lock()
+_local = threading.local()
+_origin = time.perf_counter()
+
+def enable():
+    global _spans
+    _spans = []
+
+def is_enabled():
+    return _spans is not None
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Time a phase of a command. Costs next to nothing while tracing is off."""
+    if _spans is None:
+        yield
+        return
+
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _local.depth = depth
+        with _lock:
+            _spans.append({
+                'name': name,
+                'start': start - _origin,
+                'duration': end - start,
+                'depth': depth,
+                'thread': threading.get_ident(),
+                'attrs': attrs
+            })
+
+def traced(name):
+    """Decorator form of span() for functions that are a phase of their own."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _spans is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_spans():
+    return sorted(_spans or [], key=lambda s: s['start'])
+
+def print_summary(file=None):
+    """Print spans aggregated by name, nested by depth, as a table on stderr."""
+    file = file or sys.stderr
+    spans = get_spans()
+    if not spans:
+        return
+
+    rows = {}
+    for s in spans:
+        key = (s['depth'], s['name'])
+        row = rows.setdefault(key, {'count': 0, 'total': 0.0})
+        row['count'] += 1
+        row['total'] += s['duration']
+    wall = max(s['start'] + s['duration'] for s in spans) - min(s['start'] for s in spans)
+
+    print(f"\n{'Phase':<40} {'Calls':>6} {'Total ms':>10} {'% wall':>7}", file=file)
+    print('-' * 66, file=file)
+    for (depth, name), row in rows.items():
+        label = ('  ' * depth + name)[:40]
+        share = 100 * row['total'] / wall if wall else 0
+        print(f"{label:<40} {row['count']:>6} {row['total'] * 1000:>10.1f} {share:>6.1f}%", file=file)
+
+def write_trace(path, fmt=None):
+    """Write spans as JSON lines, or as a Chrome trace-event file (``.json`` or fmt='chrome')."""
+    fmt = fmt or ('chrome' if path.endswith('.json') else 'jsonl')
+    spans = get_spans()
+
+    with open(path, 'w') as f:
+        if fmt == 'chrome':
+            pid = os.getpid()
+            events = [{
+                'name': s['name'],
+                'ph': 'X',
+                'ts': round(s['start'] * 1e6, 1),
+                'dur': round(s['duration'] * 1e6, 1),
+                'pid': pid,
+                'tid': s['thread'],
+                'args': s['attrs']
+            } for s in spans]
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        else:
+            for s in spans:
+                f.write(json.dumps({
+                    'name': s['name'],
+                    'start_ms': round(s['start'] * 1000, 3),
+                    'duration_ms': round(s['duration'] * 1000, 3),
+                    'depth': s['depth'],
+                    'thread': s['thread'],
+                    'attrs': s['attrs']
+                }) + '\n')
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import heapq
+import random
+import signal
+import argparse
+from ck_prism.ck_errors import PrismError
+from ck_prism.ck_common import (
+    DEFAULT_REFRESH_BEFORE, FALLBACK_CREDENTIAL_LIFETIME, get_home_directory, load_config, get_profile_config,
+    parse_expiration, add_profile_arguments, select_profiles
+)
+from ck_prism.ck_login import DEFAULT_MAX_WORKERS, exchange_profiles, write_aws_credentials_batch
+
+# Profiles are refreshed DEFAULT_REFRESH_BEFORE seconds before their credentials
+# expire, minus a random extra of up to this many seconds, so they spread out
+DEFAULT_JITTER = 120
+# Never schedule the next run sooner than this
+MIN_INTERVAL = 60
+# Failed profiles are retried with exponential backoff up to this delay
+MAX_RETRY_DELAY = 900
+
+def watch_utility():
+    directory = get_home_directory()
+
+    parser = argparse.ArgumentParser(prog='ck-prism watch')
+    add_profile_arguments(parser, 'keep fresh')
+    parser.add_argument('--refresh-before', type=int, default=DEFAULT_REFRESH_BEFORE,
+                        help=f'Seconds before expiry to refresh (default {DEFAULT_REFRESH_BEFORE})')
+    parser.add_argument('--jitter', type=int, default=DEFAULT_JITTER,
+                        help=f'Random extra seconds to refresh early (default {DEFAULT_JITTER})')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent credential exchanges (default {DEFAULT_MAX_WORKERS})')
+    parser.add_argument('--daemon', action='store_true', help='Detach and run in the background')
+    parser.add_argument('--log-file', help='Log file in daemon mode (default ~/.ck-prism/watch.log)')
+    args = parser.parse_args(sys.argv[2:])
+
+    config = load_config(directory)
+    profiles = select_profiles(args, config)
+    # Fail fast on unknown profiles before detaching
+    for profile in profiles:
+        get_profile_config(config, profile)
+
+    pid_file = os.path.join(directory, '.ck-prism', 'watch.pid')
+    if args.daemon:
+        log_file = args.log_file or os.path.join(directory, '.ck-prism', 'watch.log')
+        daemonize(log_file, pid_file)
+        # `kill` stops the daemon through the same path as Ctrl-C, so the pid file is removed
+        signal.signal(signal.SIGTERM, stop_on_signal)
+
+    scheduler = RefreshScheduler(config, profiles, directory, args.refresh_before, args.jitter,
+                                 args.max_workers, interactive=not args.daemon)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        log('Stopping ck-prism watch')
+    finally:
+        if args.daemon:
+            remove_pid_file(pid_file)
+
+class RefreshScheduler:
+    """Re-exchanges credentials for a set of profiles shortly before they expire."""
+
+    def __init__(self, config, profiles, directory, refresh_before=DEFAULT_REFRESH_BEFORE,
+                 jitter=DEFAULT_JITTER, max_workers=DEFAULT_MAX_WORKERS, interactive=True):
+        self.config = config
+        self.directory = directory
+        self.refresh_before = refresh_before
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self.interactive = interactive
+        self.failures = {}
+        now = time.time()
+        self.queue = [(now, profile) for profile in profiles]
+        heapq.heapify(self.queue)
+
+    def run_forever(self):
+        while self.queue:
+            delay = self.queue[0][0] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.run_due()
+
+    def run_due(self):
+        now = time.time()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue)[1])
+        if not due:
+            return
+
+        log(f"Refreshing {', '.join(due)}")
+        try:
+            results, failed = exchange_profiles(self.config, due, self.directory, self.max_workers, self.interactive)
+        except PrismError as e:
+            # exchange_profiles turns Ctrl-C into an AuthenticationError
+            if isinstance(e.__context__, KeyboardInterrupt):
+                raise
+            log(f"Refresh of {', '.join(due)} failed: {e}")
+            results, failed = {}, due
+
+        if results:
+            try:
+                write_aws_credentials_batch(
+                    [(profile, creds, get_profile_config(self.config, profile)['region']) for profile, creds in results.items()],
+                    self.directory
+                )
+            except (PrismError, OSError) as e:
+                log(f'Writing credentials failed: {e}')
+                failed = list(failed) + list(results)
+                results = {}
+
+        for profile, creds in results.items():
+            self.failures.pop(profile, None)
+            expires_at = parse_expiration(creds[3]) or time.time() + FALLBACK_CREDENTIAL_LIFETIME
+            self.schedule(profile, self.next_refresh(expires_at))
+
+        for profile in failed:
+            self.failures[profile] = self.failures.get(profile, 0) + 1
+            retry_in = min(MAX_RETRY_DELAY, MIN_INTERVAL * 2 ** (self.failures[profile] - 1))
+            log(f'Refresh of {profile} failed, retrying in {retry_in}s')
+            self.schedule(profile, time.time() + random.uniform(retry_in / 2, retry_in))
+
+    def next_refresh(self, expires_at):
+        refresh_at = expires_at - self.refresh_before - random.uniform(0, self.jitter)
+        return max(refresh_at, time.time() + MIN_INTERVAL)
+
+    def schedule(self, profile, when):
+        heapq.heappush(self.queue, (when, profile))
+        log(f"Next refresh of {profile} at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(when))}")
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+    sys.stdout.flush()
+
+def stop_on_signal(signum, frame):
+    raise KeyboardInterrupt
+
+def remove_pid_file(pid_file):
+    """Remove ``pid_file`` unless another watcher has written its own pid there since."""
+    try:
+        with open(pid_file, 'r') as f:
+            if f.read().strip() != str(os.getpid()):
+                return
+        os.remove(pid_file)
+    except OSError:
+        pass
+
+def daemonize(log_file, pid_file):
+    """Detach from the terminal (POSIX double fork) and log to ``log_file``."""
+    if not hasattr(os, 'fork'):
+        print('--daemon is not supported on this platform; run ck-prism watch in the foreground instead')
+        exit(1)
+
+    sys.stdout.flush()
+    if os.fork() > 0:
+        os._exit(0)
+    os.setsid()
+    pid = os.fork()
+    if pid > 0:
+        print(f'ck-prism watch running in the background (pid {pid}), logging to {log_file}')
+        sys.stdout.flush()
+        os._exit(0)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    with open(pid_file, 'w') as f:
+        f.write(str(os.getpid()))
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log_fd = os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null_fd, sys.stdin.fileno())
+    os.dup2(log_fd, sys.stdout.fileno())
+    os.dup2(log_fd, sys.stderr.fileno())
+    os.close(null_fd)
+    os.close(log_fd)
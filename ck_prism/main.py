@@ -1,22 +1,100 @@
 import sys
-from ck_prism.ck_configuration import configure_utility
-from ck_prism.ck_help import help_utility
-from ck_prism.ck_login import login_utility
+import importlib
+from ck_prism.ck_errors import PrismError
+
+# Subcommand -> (module, function). Modules are imported only when their
+# command runs so that `help` and cache hits never load requests or the
+# callback server.
+COMMANDS = {
+    'configure': ('ck_prism.ck_configuration', 'configure_utility'),
+    'login': ('ck_prism.ck_login', 'login_utility'),
+    'credential-process': ('ck_prism.ck_credential_process', 'credential_process_utility'),
+    'agent': ('ck_prism.ck_agent', 'agent_utility'),
+    'watch': ('ck_prism.ck_watch', 'watch_utility'),
+    'exec': ('ck_prism.ck_exec', 'exec_utility'),
+    'status': ('ck_prism.ck_status', 'status_utility'),
+    'loadtest': ('ck_prism.ck_loadtest', 'loadtest_utility'),
+    'help': ('ck_prism.ck_help', 'help_utility'),
+}
+
+# Flags accepted by every command: name -> takes a value
+GLOBAL_FLAGS = {
+    '--timings': False,
+    '--trace-file': True,
+    '--trace-format': True,
+    '--cprofile': True,
+}
 
 def main():
+    options = pop_global_flags(sys.argv)
+
     if len(sys.argv) == 1:
-        print('ERROR: ck-prism requires one of: configure, login, or help.\nRun ck-prism help for more information.')
-    elif len(sys.argv) > 4:
-        print('ERROR: Too many arguments. Run ck-prism help for more information.')
-    else: 
-        if sys.argv[1] == 'configure':
-            configure_utility()
-        elif sys.argv[1] == 'login':
-            login_utility()
-        elif sys.argv[1] == 'help':
-            help_utility()
+        print(f"ERROR: ck-prism requires one of: {', '.join(COMMANDS)}.\nRun ck-prism help for more information.")
+    elif sys.argv[1] in COMMANDS:
+        module_name, function_name = COMMANDS[sys.argv[1]]
+        try:
+            if options:
+                run_instrumented(sys.argv[1], module_name, function_name, options)
+            else:
+                getattr(importlib.import_module(module_name), function_name)()
+        except PrismError as e:
+            print(e)
+            exit(1)
+    else:
+        print("Invalid arguments. Run ck-prism help for more information.")
+
+def pop_global_flags(argv):
+    """Remove the global tracing flags from ``argv`` and return them.
+
+    Scanning stops at ``--``: what follows belongs to the command that
+    ``ck-prism exec`` runs and is passed on untouched.
+    """
+    options = {}
+    i = 1
+    while i < len(argv):
+        flag = argv[i]
+        if flag == '--':
+            break
+        if flag not in GLOBAL_FLAGS:
+            i += 1
+            continue
+        if GLOBAL_FLAGS[flag]:
+            if i + 1 >= len(argv):
+                print(f'ERROR: {flag} requires a value. Run ck-prism help for more information.')
+                exit(1)
+            options[flag] = argv[i + 1]
+            del argv[i:i + 2]
         else:
-            print("Invalid arguments. Run ck-prism help for more information.")
+            options[flag] = True
+            del argv[i]
+    return options
+
+def run_instrumented(command, module_name, function_name, options):
+    from ck_prism import ck_trace
+
+    profiler = None
+    if '--cprofile' in options:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    if '--timings' in options or '--trace-file' in options:
+        ck_trace.enable()
+
+    try:
+        if profiler:
+            profiler.enable()
+        with ck_trace.span(command):
+            with ck_trace.span('import'):
+                utility = getattr(importlib.import_module(module_name), function_name)
+            utility()
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(options['--cprofile'])
+        if '--trace-file' in options:
+            ck_trace.write_trace(options['--trace-file'], options.get('--trace-format'))
+        if '--timings' in options:
+            ck_trace.print_summary()
 
 if __name__ == "__main__":
     main()
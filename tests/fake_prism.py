@@ -0,0 +1,301 @@
+import json
+import time
+import base64
+import random
+import hashlib
+import secrets
+import threading
+import http.server
+import socketserver
+import urllib.parse
+from ck_prism.ck_jwt import SHA256_DIGEST_INFO
+
+# RSA key the stand-in signs access tokens with. It is published here and
+# must never be trusted outside of tests and benchmarks.
+TEST_KEY_ID = 'ck-prism-test'
+TEST_KEY_E = 65537
+TEST_KEY_P = int(
+    'e62f062a23f09812b50d2069aa0e27ed11baac83e3d14fbe128d92f55838440bc14e93389d95b967d7572406f0e69b25'
+    '0188ab98859aa77bc168cc935824b9f2b4529adbc23fe418e2164d9984984d75c26fec153c1fbe7a51080c88f1572ddd'
+    '1286b092affd89dae3cea28c3b3cf6afd254d945259291664d8ccfeb61553f29', 16)
+TEST_KEY_Q = int(
+    'dcfc9225d18ac6d397576112374d3f7d0cb68942a3e291f8ea68fd8963c736fffd908ec3ad452cd8d0dec43ee4082fc8'
+    '3537f2ab20450fc71fe13c88ab5887793a902a6fa46614d8f9f038296d4c5c92e0cc8aa2c2f5a6882081036c81bc430f'
+    'e816288042163d270e576688a08a5feb8f7f764225d37b13c0f6732e1a708c6f', 16)
+
+def _inverse(a, m):
+    """Modular inverse (pow(a, -1, m) needs Python 3.8)."""
+    x0, x1, r0, r1 = 0, 1, m, a % m
+    while r1:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        x0, x1 = x1, x0 - q * x1
+    return x0 % m
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _int_b64url(value):
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+class FakeSigningKey:
+    """RS256 signer for the test key, using the CRT for speed."""
+
+    def __init__(self, p=TEST_KEY_P, q=TEST_KEY_Q, e=TEST_KEY_E, kid=TEST_KEY_ID):
+        self.kid = kid
+        self.n = p * q
+        self.e = e
+        d = _inverse(e, (p - 1) * (q - 1))
+        self._p, self._q = p, q
+        self._dp, self._dq = d % (p - 1), d % (q - 1)
+        self._qinv = _inverse(q, p)
+
+    def jwk(self):
+        return {'kid': self.kid, 'kty': 'RSA', 'alg': 'RS256', 'use': 'sig',
+                'n': _int_b64url(self.n), 'e': _int_b64url(self.e)}
+
+    def sign_jwt(self, claims):
+        header = _b64url(json.dumps({'alg': 'RS256', 'typ': 'JWT', 'kid': self.kid}).encode('utf-8'))
+        body = _b64url(json.dumps(claims).encode('utf-8'))
+        signing_input = f'{header}.{body}'.encode('ascii')
+
+        size = (self.n.bit_length() + 7) // 8
+        digest_info = SHA256_DIGEST_INFO + hashlib.sha256(signing_input).digest()
+        m = int.from_bytes(b'\x00\x01' + b'\xff' * (size - len(digest_info) - 3) + b'\x00' + digest_info, 'big')
+        s1 = pow(m, self._dp, self._p)
+        s2 = pow(m, self._dq, self._q)
+        s = s2 + (self._qinv * (s1 - s2) % self._p) * self._q
+        return f'{header}.{body}.{_b64url(s.to_bytes(size, "big"))}'
+
+class FakePrismServer:
+    """Local stand-in for the Prism login (Keycloak) and /exchange endpoints.
+
+    Used by the tests and the benchmarks so they can run offline. It lives
+    outside the ck_prism package so that its signing key is never
+    installed. ``latency`` (seconds) is added to every response, a fraction
+    ``error_rate`` of requests fails with 503, and the role catalog holds
+    ``role_count`` roles spread over ``account_count`` accounts.
+    ``sso_session`` is whether the "browser" is already signed in: without
+    it a ``prompt=none`` authorization is answered with ``login_required``
+    until a full authorization has been made. Access tokens are RS256 JWTs
+    signed with ``signing_key`` (the published test key by default), whose
+    JWKS is served at the realm's ``certs`` endpoint.
+
+        with FakePrismServer(role_count=10000) as server:
+            profile = server.profile_config()
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, role_count=100, account_count=None,
+                 token_lifetime=900, credential_lifetime=3600, port=0, sso_session=True):
+        self.latency = latency
+        self.sso_session = sso_session
+        self.signing_key = FakeSigningKey()
+        self._last_access_token = None
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.credential_lifetime = credential_lifetime
+        self.port = port
+        self.requests = {}
+        self._codes = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+        account_count = account_count or max(1, role_count // 5)
+        roles = []
+        account_names = {}
+        for i in range(role_count):
+            account_id = f'{100000000000 + i % account_count:012d}'
+            account_names[account_id] = f'Account {i % account_count}'
+            roles.append(f'arn:aws:iam::{account_id}:role/Role{i},arn:aws:iam::{account_id}:saml-provider/Prism')
+        self.roles_body = json.dumps({'available_roles': roles, 'account_names': account_names}).encode('utf-8')
+        self.roles_etag = '"' + hashlib.sha1(self.roles_body).hexdigest() + '"'
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def profile_config(self, realm='bench', role_arn=None, region='us-east-1'):
+        """Profile settings for config.json that point at this server."""
+        return {
+            'realm': realm,
+            'client_id': 'ckauth-cli',
+            'region': region,
+            'output': 'json',
+            'keycloak_base_url': self.base_url,
+            'api_endpoint': f'{self.base_url}/exchange',
+            'role_arn': role_arn or 'arn:aws:iam::100000000000:role/Role0,arn:aws:iam::100000000000:saml-provider/Prism'
+        }
+
+    def issue_access_token(self, realm='bench', client_id='ckauth-cli'):
+        """Signed access token. Signing takes milliseconds in pure Python, so
+        tokens for the same realm and client are reused within a second."""
+        now = int(time.time())
+        key = (realm, client_id, now, self.signing_key.kid, self.token_lifetime)
+        with self._lock:
+            if self._last_access_token and self._last_access_token[0] == key:
+                return self._last_access_token[1]
+        token = self.signing_key.sign_jwt({
+            'iss': f'{self.base_url}/realms/{realm}',
+            'aud': 'account',
+            'azp': client_id,
+            'sub': 'fake-user',
+            'typ': 'Bearer',
+            'iat': now,
+            'exp': now + self.token_lifetime
+        })
+        with self._lock:
+            self._last_access_token = (key, token)
+        return token
+
+    def issue_tokens(self, realm='bench', client_id='ckauth-cli'):
+        return {
+            'access_token': self.issue_access_token(realm, client_id),
+            'refresh_token': 'rt-' + secrets.token_hex(16),
+            'id_token': 'id-' + secrets.token_hex(16),
+            'expires_in': self.token_lifetime,
+            'refresh_expires_in': self.token_lifetime * 6
+        }
+
+    def issue_credentials(self):
+        expiration = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + self.credential_lifetime))
+        return {
+            'credentials': {
+                'AccessKeyId': 'ASIA' + secrets.token_hex(8).upper(),
+                'SecretAccessKey': secrets.token_urlsafe(30),
+                'SessionToken': secrets.token_urlsafe(300),
+                'Expiration': expiration
+            }
+        }
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def start(self):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Send headers and body in one segment; otherwise delayed ACKs
+            # add ~40 ms to every keep-alive response
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                if parsed.path.endswith('/protocol/openid-connect/certs'):
+                    fake.count('certs')
+                    if not self.delay_or_fail():
+                        self.send_body(200, {'keys': [fake.signing_key.jwk()]})
+                    return
+                if not parsed.path.endswith('/protocol/openid-connect/auth'):
+                    self.send_body(404, {'error': 'not_found'})
+                    return
+                fake.count('auth')
+                if self.delay_or_fail():
+                    return
+
+                params = dict(urllib.parse.parse_qsl(parsed.query))
+                redirect = {'state': params.get('state', '')}
+                with fake._lock:
+                    if params.get('prompt') == 'none' and not fake.sso_session:
+                        redirect['error'] = 'login_required'
+                    else:
+                        # Any interactive prompt signs the browser in
+                        fake.sso_session = True
+                        redirect['code'] = secrets.token_hex(16)
+                        fake._codes[redirect['code']] = params.get('redirect_uri')
+                location = params['redirect_uri'] + '?' + urllib.parse.urlencode(redirect)
+                self.send_response(302)
+                self.send_header('Location', location)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                parsed = urllib.parse.urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+                if parsed.path.endswith('/protocol/openid-connect/token'):
+                    fake.count('token')
+                    if not self.delay_or_fail():
+                        realm = parsed.path.split('/')[2]
+                        self.handle_token(realm, dict(urllib.parse.parse_qsl(body.decode('utf-8'))))
+                elif parsed.path == '/exchange':
+                    fake.count('exchange')
+                    if not self.delay_or_fail():
+                        self.handle_exchange(json.loads(body or b'{}'))
+                else:
+                    self.send_body(404, {'error': 'not_found'})
+
+            def handle_token(self, realm, form):
+                grant_type = form.get('grant_type')
+                if grant_type == 'authorization_code':
+                    with fake._lock:
+                        valid = fake._codes.pop(form.get('code'), None) is not None
+                    if not valid:
+                        self.send_body(400, {'error': 'invalid_grant'})
+                        return
+                elif grant_type == 'refresh_token':
+                    if not form.get('refresh_token', '').startswith('rt-'):
+                        self.send_body(400, {'error': 'invalid_grant'})
+                        return
+                else:
+                    self.send_body(400, {'error': 'unsupported_grant_type'})
+                    return
+                self.send_body(200, fake.issue_tokens(realm, form.get('client_id')))
+
+            def handle_exchange(self, payload):
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    self.send_body(401, {'error': 'unauthorized'})
+                    return
+                if payload.get('selected_role'):
+                    self.send_body(200, fake.issue_credentials())
+                    return
+                if self.headers.get('If-None-Match') == fake.roles_etag:
+                    self.send_raw(304, b'', {'ETag': fake.roles_etag})
+                    return
+                self.send_raw(200, fake.roles_body, {'ETag': fake.roles_etag})
+
+            def delay_or_fail(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake.error_rate and random.random() < fake.error_rate:
+                    self.send_body(503, {'error': 'unavailable'})
+                    return True
+                return False
+
+            def send_body(self, status, body):
+                self.send_raw(status, json.dumps(body).encode('utf-8'))
+
+            def send_raw(self, status, payload, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args, **kwargs):
+                pass
+
+        class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = ThreadingServer(('127.0.0.1', self.port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,82 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import contextlib
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_agent import CredentialAgent, start_agent_server, get_profile_url  # noqa: E402
+from ck_prism.ck_common import get_profile_config, parse_expiration  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+AUTHORIZATION_TOKEN = 'agent-test-token'
+
+class AgentServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        config = {'tests': self.server.profile_config(realm='tests')}
+        profile_config = get_profile_config(config, 'tests')
+        tokens = self.server.issue_tokens('tests', profile_config['client_id'])
+        ck_login.save_tokens(ck_login.get_token_file(profile_config, self.home), ck_login.build_tokens(tokens))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.agent = CredentialAgent(config, ['tests'], self.home)
+        self.agent_server = start_agent_server(self.agent, AUTHORIZATION_TOKEN)
+        self.port = self.agent_server.server_address[1]
+
+    def tearDown(self):
+        self.agent_server.shutdown()
+        self.agent_server.server_close()
+        shutil.rmtree(self.home)
+
+    def get(self, url, authorization=None):
+        """Status and JSON body of a GET to the agent."""
+        request = urllib.request.Request(url, headers={'Authorization': authorization} if authorization else {})
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode('utf-8'))
+
+    def test_serves_ecs_credentials_with_the_token(self):
+        status, body = self.get(get_profile_url(self.port, 'tests'), AUTHORIZATION_TOKEN)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(sorted(body), ['AccessKeyId', 'Expiration', 'SecretAccessKey', 'Token'])
+        self.assertTrue(body['AccessKeyId'].startswith('ASIA'))
+        self.assertRegex(body['Expiration'], r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ$')
+        self.assertGreater(parse_expiration(body['Expiration']), time.time())
+
+    def test_rejects_a_missing_token(self):
+        exchanges = self.server.requests.get('exchange', 0)
+        status, _ = self.get(get_profile_url(self.port, 'tests'))
+
+        self.assertEqual(status, 401)
+        self.assertEqual(self.server.requests.get('exchange', 0), exchanges)
+
+    def test_rejects_a_wrong_token(self):
+        status, _ = self.get(get_profile_url(self.port, 'tests'), 'not-' + AUTHORIZATION_TOKEN)
+        self.assertEqual(status, 401)
+
+    def test_unknown_profile_is_not_found(self):
+        status, _ = self.get(get_profile_url(self.port, 'other'), AUTHORIZATION_TOKEN)
+        self.assertEqual(status, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism.ck_callback import acquire_callback_server, release_callback_server  # noqa: E402
+
+class CallbackServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = acquire_callback_server()
+        self.addCleanup(release_callback_server)
+
+    def redirect(self, **params):
+        """Status of the browser redirect to the callback server carrying ``params``."""
+        url = self.server.redirect_uri + '?' + urllib.parse.urlencode(params)
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_out_of_order_redirects_are_routed_by_state(self):
+        first = self.server.register('state-first')
+        second = self.server.register('state-second')
+
+        self.assertEqual(self.redirect(code='code-second', state='state-second'), 200)
+        self.assertTrue(second['done'].is_set())
+        self.assertFalse(first['done'].is_set())
+
+        self.assertEqual(self.redirect(code='code-first', state='state-first'), 200)
+        self.assertTrue(first['done'].wait(5))
+        self.assertEqual((first['code'], first['error']), ('code-first', None))
+        self.assertEqual((second['code'], second['error']), ('code-second', None))
+
+    def test_unknown_state_is_rejected(self):
+        pending = self.server.register('state-known')
+        self.addCleanup(self.server.unregister, 'state-known')
+
+        self.assertEqual(self.redirect(code='stolen', state='state-unknown'), 400)
+        self.assertFalse(pending['done'].is_set())
+
+    def test_redirect_is_delivered_once(self):
+        self.server.register('state-once')
+
+        self.assertEqual(self.redirect(code='code', state='state-once'), 200)
+        self.assertEqual(self.redirect(code='replayed', state='state-once'), 400)
+
+if __name__ == '__main__':
+    unittest.main()
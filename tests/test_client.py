@@ -0,0 +1,79 @@
+import io
+import os
+import asyncio
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_client import PrismClient  # noqa: E402
+from ck_prism.ck_async import AsyncPrismClient  # noqa: E402
+from ck_prism.ck_common import get_profile_config, progress  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+class PrismClientProgressTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.config = {'tests': self.server.profile_config(realm='tests')}
+        profile_config = get_profile_config(self.config, 'tests')
+        tokens = self.server.issue_tokens('tests', profile_config['client_id'])
+        ck_login.save_tokens(ck_login.get_token_file(profile_config, self.home), ck_login.build_tokens(tokens))
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def client(self, verbose):
+        return PrismClient('tests', self.home, self.config, verbose=verbose)
+
+    def capture(self, fn):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            fn()
+        return output.getvalue()
+
+    def test_quiet_client_prints_nothing(self):
+        self.assertEqual(self.capture(self.client(False).get_credentials), '')
+
+    def test_verbose_client_prints_progress(self):
+        self.assertIn('Exchanging token', self.capture(self.client(True).get_credentials))
+
+    def test_quiet_client_does_not_silence_the_process(self):
+        self.client(False).get_credentials()
+        self.assertEqual(self.capture(lambda: progress('still printed')), 'still printed\n')
+
+    def test_keys_are_shared_within_a_realm(self):
+        self.config['copy'] = dict(self.config['tests'])
+        client = self.client(False)
+        self.assertEqual(client.token_key('tests'), client.token_key('copy'))
+        self.assertEqual(client.credential_key('tests'), client.credential_key('copy'))
+        self.assertNotEqual(client.credential_key('tests'), client.credential_key('tests', 'arn:aws:iam::1:role/Other'))
+
+    def test_async_client_shares_requests(self):
+        self.config['copy'] = dict(self.config['tests'])
+
+        async def fetch():
+            async with AsyncPrismClient('tests', self.home, self.config) as client:
+                return await client.get_credentials_for_profiles()
+
+        loop = asyncio.new_event_loop()
+        try:
+            credentials, errors = loop.run_until_complete(fetch())
+        finally:
+            loop.close()
+        self.assertEqual(errors, {})
+        self.assertEqual(credentials['tests'].access_key_id, credentials['copy'].access_key_id)
+
+if __name__ == '__main__':
+    unittest.main()
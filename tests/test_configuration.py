@@ -0,0 +1,112 @@
+import io
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_configuration  # noqa: E402
+from ck_prism.ck_roles import RoleIndex  # noqa: E402
+from ck_prism.ck_store import get_store  # noqa: E402
+from ck_prism.ck_common import load_config  # noqa: E402
+
+TEMP_CONFIG = {
+    'prism_domain': 'prism.example.com',
+    'realm': 'sso',
+    'client_id': 'ckauth-cli',
+    'keycloak_base_url': 'https://login.prism.example.com',
+    'api_endpoint': 'https://cli.prism.example.com/exchange'
+}
+ACCOUNT_NAMES = {'111111111111': 'Production'}
+
+def roles(*names):
+    return [f'arn:aws:iam::111111111111:role/{name},arn:aws:iam::111111111111:saml-provider/Prism' for name in names]
+
+class SyncProfilesTest(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+
+    def generate(self, template, region, *role_names):
+        index = RoleIndex(roles(*role_names), ACCOUNT_NAMES)
+        profiles = ck_configuration.generate_profiles(TEMP_CONFIG, index, template, region)
+        get_store(self.home).save_profiles(profiles)
+
+    def sync(self, available, **options):
+        args = argparse.Namespace(realm=None, prism_domain=None, name_template=None, region=None, dry_run=False)
+        vars(args).update(options)
+        catalog = (TEMP_CONFIG, roles(*available), ACCOUNT_NAMES)
+        with mock.patch.object(ck_configuration, 'fetch_realm_roles', return_value=catalog), \
+                contextlib.redirect_stdout(io.StringIO()):
+            ck_configuration.sync_profiles(self.home, args)
+        return load_config(self.home)
+
+    def test_each_template_keeps_its_profiles(self):
+        self.generate('{account}-{role}', 'us-east-1', 'Admin', 'ReadOnly')
+        self.generate('{account_name}-{role}', 'eu-west-1', 'Admin', 'ReadOnly')
+
+        config = self.sync(['Admin', 'Billing'])
+
+        self.assertEqual(sorted(config), [
+            '111111111111-Admin', '111111111111-Billing', 'Production-Admin', 'Production-Billing'
+        ])
+        self.assertEqual(config['Production-Billing']['name_template'], '{account_name}-{role}')
+        self.assertEqual(config['Production-Billing']['region'], 'eu-west-1')
+        self.assertEqual(config['111111111111-Billing']['region'], 'us-east-1')
+
+    def test_edited_settings_are_kept(self):
+        self.generate('{account}-{role}', 'us-east-1', 'Admin')
+        get_store(self.home).save_profiles({'111111111111-Admin': dict(load_config(self.home)['111111111111-Admin'],
+                                                                        output='text')})
+
+        config = self.sync(['Admin'])
+
+        self.assertEqual(config['111111111111-Admin']['output'], 'text')
+
+    def test_name_template_adds_a_template(self):
+        self.generate('{account}-{role}', 'us-east-1', 'Admin')
+
+        config = self.sync(['Admin'], name_template='{role}')
+
+        self.assertEqual(sorted(config), ['111111111111-Admin', 'Admin'])
+
+class ConfigureCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+
+    def configure(self, *argv, answers=()):
+        """Run ``ck-prism configure`` with ``answers`` for its prompts; returns the exit status."""
+        catalog = (TEMP_CONFIG, roles('Admin'), ACCOUNT_NAMES)
+        with mock.patch.object(sys, 'argv', ['ck-prism', 'configure'] + list(argv)), \
+                mock.patch.object(ck_configuration, 'get_home_directory', return_value=self.home), \
+                mock.patch.object(ck_configuration, 'fetch_realm_roles', return_value=catalog), \
+                mock.patch('builtins.input', side_effect=list(answers)), \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            try:
+                ck_configuration.configure_utility()
+            except SystemExit as e:
+                return e.code
+        return 0
+
+    def test_profile_names_the_picked_profile(self):
+        # Account, role and region prompts; the profile name is not asked for
+        status = self.configure('--prism-domain', 'prism.example.com', '--realm', 'sso', '--profile', 'production',
+                                answers=['1', '1', ''])
+
+        self.assertEqual(status, 0)
+        config = load_config(self.home)
+        self.assertEqual(list(config), ['production'])
+        self.assertEqual(config['production']['role_name'], 'Admin')
+
+    def test_profile_is_rejected_with_bulk_modes(self):
+        for mode in (['--all-roles'], ['--sync'], ['--from', 'manifest.json']):
+            self.assertEqual(self.configure('--profile', 'production', *mode), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_store import get_store  # noqa: E402
+from ck_prism.ck_common import FALLBACK_CREDENTIAL_LIFETIME, get_profile_config, parse_expiration  # noqa: E402
+from ck_prism.ck_credential_process import get_process_credentials  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+class CredentialProcessTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+        self.addCleanup(vars(self.server).pop, 'issue_credentials', None)
+        environment = mock.patch.dict(os.environ, {'HOME': self.home, 'USERPROFILE': self.home})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        config = {'tests': self.server.profile_config(realm='tests')}
+        get_store(self.home).save_profiles(config)
+        profile_config = get_profile_config(config, 'tests')
+        tokens = self.server.issue_tokens('tests', profile_config['client_id'])
+        ck_login.save_tokens(ck_login.get_token_file(profile_config, self.home), ck_login.build_tokens(tokens))
+
+    def get_credentials(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return get_process_credentials('tests')
+
+    def exchanges(self):
+        return self.server.requests.get('exchange', 0)
+
+    def test_cache_hit_skips_the_exchange(self):
+        first = self.get_credentials()
+        exchanges = self.exchanges()
+
+        self.assertEqual(self.get_credentials(), first)
+        self.assertEqual(self.exchanges(), exchanges)
+
+    def test_missing_expiration_uses_the_fallback_lifetime(self):
+        issue_credentials = self.server.issue_credentials
+
+        def without_expiration():
+            response = issue_credentials()
+            del response['credentials']['Expiration']
+            return response
+        self.server.issue_credentials = without_expiration
+
+        credentials = self.get_credentials()
+        exchanges = self.exchanges()
+
+        expires_at = parse_expiration(credentials['Expiration'])
+        self.assertAlmostEqual(expires_at, time.time() + FALLBACK_CREDENTIAL_LIFETIME, delta=5)
+        self.assertEqual(self.get_credentials(), credentials)
+        self.assertEqual(self.exchanges(), exchanges)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_common import get_profile_config  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+PRINT_ARGV = 'import sys, json; print(json.dumps(sys.argv[1:]))'
+
+class ExecTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        config = {'tests': self.server.profile_config(realm='tests')}
+        os.makedirs(os.path.join(self.home, '.ck-prism'))
+        with open(os.path.join(self.home, '.ck-prism', 'config.json'), 'w') as f:
+            json.dump(config, f)
+
+        # A logged-in session, so that exec never opens a browser
+        profile_config = get_profile_config(config, 'tests')
+        tokens = self.server.issue_tokens('tests', profile_config['client_id'])
+        ck_login.save_tokens(ck_login.get_token_file(profile_config, self.home), ck_login.build_tokens(tokens))
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def run_cli(self, *args):
+        env = dict(os.environ, HOME=self.home, USERPROFILE=self.home, PYTHONPATH=ROOT)
+        return subprocess.run([sys.executable, '-m', 'ck_prism.main'] + list(args), cwd=self.home, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+
+    def test_child_argv_is_passed_unchanged(self):
+        child_args = ['--timings', '--trace-file', 'x.json', '--cprofile', 'x.prof', '--profile', 'other', '--', '-x']
+        result = self.run_cli('exec', '--profile', 'tests', '--', sys.executable, '-c', PRINT_ARGV, *child_args)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), child_args)
+        self.assertFalse(os.path.exists(os.path.join(self.home, 'x.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.home, 'x.prof')))
+
+    def test_global_flags_before_separator_apply_to_ck_prism(self):
+        result = self.run_cli('exec', '--timings', '--profile', 'tests', '--', sys.executable, '-c', PRINT_ARGV, 'a')
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), ['a'])
+
+    def test_child_gets_credentials(self):
+        result = self.run_cli('exec', '--profile', 'tests', '--', sys.executable, '-c',
+                              'import os; print(os.environ["CK_PRISM_PROFILE"], os.environ["AWS_ACCESS_KEY_ID"][:4])')
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ['tests', 'ASIA'])
+
+    def test_exit_status_is_the_childs(self):
+        result = self.run_cli('exec', '--profile', 'tests', '--', sys.executable, '-c', 'raise SystemExit(7)')
+        self.assertEqual(result.returncode, 7)
+
+    def test_command_requires_separator(self):
+        result = self.run_cli('exec', '--profile', 'tests')
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('Usage: ck-prism exec', result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
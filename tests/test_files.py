@@ -0,0 +1,112 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism.ck_files import atomic_write  # noqa: E402
+from ck_prism.ck_aws_files import update_ini_file, patch_ini  # noqa: E402
+
+class PatchIniTest(unittest.TestCase):
+    def test_replaces_a_key_in_place(self):
+        text = '[default]\nregion = us-east-1\noutput = json\n'
+        self.assertEqual(patch_ini(text, {'default': {'region': 'eu-west-1'}}),
+                         '[default]\nregion = eu-west-1\noutput = json\n')
+
+    def test_key_match_ignores_case(self):
+        text = '[default]\nAWS_Access_Key_ID=old\n'
+        self.assertEqual(patch_ini(text, {'default': {'aws_access_key_id': 'new'}}),
+                         '[default]\naws_access_key_id = new\n')
+
+    def test_appends_missing_keys_and_sections(self):
+        text = '[default]\nregion = us-east-1\n\n[other]\noutput = json'
+        patched = patch_ini(text, {'default': {'output': 'text'}, 'production': {'region': 'eu-west-1'}})
+
+        self.assertEqual(patched, '[default]\nregion = us-east-1\noutput = text\n\n[other]\noutput = json\n'
+                                  '\n[production]\nregion = eu-west-1\n')
+
+    def test_empty_file(self):
+        self.assertEqual(patch_ini('', {'default': {'region': 'us-east-1'}}), '[default]\nregion = us-east-1\n')
+
+    def test_keeps_comments_and_continuation_lines(self):
+        text = ('# managed by hand\n'
+                '[profile production]\n'
+                '; the role to assume\n'
+                'region = us-east-1\n'
+                's3 =\n'
+                '    max_concurrent_requests = 20\n'
+                'sso_scopes =\n'
+                '    one\n'
+                '    two\n'
+                'output = json\n')
+        patched = patch_ini(text, {'profile production': {'region': 'eu-west-1', 'sso_scopes': 'three'}})
+
+        self.assertEqual(patched, ('# managed by hand\n'
+                                   '[profile production]\n'
+                                   '; the role to assume\n'
+                                   'region = eu-west-1\n'
+                                   's3 =\n'
+                                   '    max_concurrent_requests = 20\n'
+                                   'sso_scopes = three\n'
+                                   'output = json\n'))
+
+    def test_patches_only_the_first_of_duplicate_sections(self):
+        text = '[default]\nregion = us-east-1\n[default]\nregion = us-west-2\n'
+        self.assertEqual(patch_ini(text, {'default': {'region': 'eu-west-1'}}),
+                         '[default]\nregion = eu-west-1\n[default]\nregion = us-west-2\n')
+
+    def test_keeps_crlf_line_endings(self):
+        text = '[default]\r\nregion = us-east-1\r\n'
+        patched = patch_ini(text, {'default': {'region': 'eu-west-1', 'output': 'json'}, 'other': {'output': 'text'}})
+
+        self.assertEqual(patched, '[default]\r\nregion = eu-west-1\r\noutput = json\r\n'
+                                  '\r\n[other]\r\noutput = text\r\n')
+
+    def test_update_ini_file_keeps_crlf_on_disk(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'credentials')
+        with open(path, 'wb') as f:
+            f.write(b'[default]\r\nregion = us-east-1\r\n')
+
+        self.assertTrue(update_ini_file(path, {'production': {'region': 'eu-west-1'}}))
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'[default]\r\nregion = us-east-1\r\n\r\n[production]\r\nregion = eu-west-1\r\n')
+
+@unittest.skipUnless(hasattr(os, 'symlink') and sys.platform != 'win32', 'needs symlinks')
+class SymlinkedFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.target = os.path.join(self.directory, 'dotfiles', 'credentials')
+        self.link = os.path.join(self.directory, '.aws', 'credentials')
+        os.makedirs(os.path.dirname(self.target))
+        os.makedirs(os.path.dirname(self.link))
+        with open(self.target, 'w') as f:
+            f.write('# managed in dotfiles\n[other]\nregion = eu-west-1\n')
+        os.symlink(self.target, self.link)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_atomic_write_replaces_the_target(self):
+        atomic_write(self.link, 'new\n')
+
+        self.assertTrue(os.path.islink(self.link))
+        with open(self.target) as f:
+            self.assertEqual(f.read(), 'new\n')
+
+    def test_update_ini_file_keeps_the_link(self):
+        self.assertTrue(update_ini_file(self.link, {'production': {'aws_access_key_id': 'AKIA'}}))
+
+        self.assertTrue(os.path.islink(self.link))
+        with open(self.target) as f:
+            content = f.read()
+        self.assertIn('# managed in dotfiles', content)
+        self.assertIn('[production]\naws_access_key_id = AKIA\n', content)
+        self.assertEqual(os.listdir(os.path.dirname(self.link)), ['credentials'])
+
+if __name__ == '__main__':
+    unittest.main()
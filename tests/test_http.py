@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import email.utils
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_http, ck_login  # noqa: E402
+
+URL = 'https://login.prism.example.com/realms/tests/protocol/openid-connect/token'
+
+def response(status, retry_after=None):
+    result = mock.Mock(status_code=status, headers={})
+    if retry_after is not None:
+        result.headers['Retry-After'] = retry_after
+    return result
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        patches = [
+            mock.patch.object(ck_http.time, 'sleep', side_effect=self.sleeps.append),
+            mock.patch.dict(os.environ, {'CK_PRISM_MAX_RETRIES': '2'}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def post(self, *outcomes, **kwargs):
+        """ck_http.post against a session that answers with ``outcomes`` in turn; returns (result, calls)."""
+        session = mock.Mock()
+        session.request.side_effect = list(outcomes)
+        with mock.patch.object(ck_http, 'get_session', return_value=session):
+            return ck_http.post(URL, **kwargs), session.request.call_count
+
+    def test_retries_5xx_with_backoff(self):
+        result, calls = self.post(response(503), response(502), response(200))
+
+        self.assertEqual((result.status_code, calls), (200, 3))
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLessEqual(self.sleeps[0], ck_http.BACKOFF_BASE)
+        self.assertLessEqual(self.sleeps[1], ck_http.BACKOFF_BASE * 2)
+
+    def test_retries_connection_errors(self):
+        result, calls = self.post(requests.exceptions.ConnectionError('reset'), response(200))
+        self.assertEqual((result.status_code, calls), (200, 2))
+
+    def test_gives_up_after_max_retries(self):
+        result, calls = self.post(response(503), response(503), response(503), response(200))
+        self.assertEqual((result.status_code, calls), (503, 3))
+
+    def test_raises_the_last_connection_error(self):
+        with self.assertRaises(requests.exceptions.ConnectTimeout):
+            self.post(*[requests.exceptions.ConnectTimeout('slow')] * 3)
+
+    def test_client_errors_are_not_retried(self):
+        result, calls = self.post(response(400), response(200))
+        self.assertEqual((result.status_code, calls), (400, 1))
+
+    def test_retry_false_sends_once(self):
+        result, calls = self.post(response(503), response(200), retry=False)
+        self.assertEqual((result.status_code, calls), (503, 1))
+        self.assertEqual(self.sleeps, [])
+
+    def test_retry_after_seconds(self):
+        result, _ = self.post(response(429, '2'), response(200))
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.sleeps, [2.0])
+
+    def test_retry_after_http_date(self):
+        retry_at = email.utils.formatdate(time.time() + 10, usegmt=True)
+        self.post(response(503, retry_at), response(200))
+
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertAlmostEqual(self.sleeps[0], 10, delta=2)
+
+    def test_long_retry_after_is_returned(self):
+        result, calls = self.post(response(429, str(ck_http.MAX_RETRY_AFTER + 1)), response(200))
+
+        self.assertEqual((result.status_code, calls), (429, 1))
+        self.assertEqual(self.sleeps, [])
+
+    def test_backoff_is_capped(self):
+        for _ in range(20):
+            self.assertLessEqual(ck_http.backoff_delay(10), ck_http.BACKOFF_CAP)
+
+class HedgeTest(unittest.TestCase):
+    def test_slow_request_is_hedged(self):
+        calls = []
+
+        def post(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return response(200)
+            return response(201)
+
+        with mock.patch.object(ck_http, 'post', side_effect=post):
+            result = ck_http.hedged_post(URL, hedge_after=0.05)
+
+        self.assertEqual(result.status_code, 201)
+        self.assertEqual(len(calls), 2)
+
+    def refresh_hedge_after(self, config):
+        hedged_post = mock.Mock(return_value=response(500))
+        with mock.patch.object(ck_http, 'hedged_post', hedged_post):
+            ck_login.refresh_tokens(dict(config, keycloak_base_url='https://login.example.com', realm='tests',
+                                         client_id='ckauth-cli'), 'rt-token')
+        return hedged_post.call_args[1]['hedge_after']
+
+    def test_token_refresh_is_not_hedged_by_default(self):
+        with mock.patch.dict(os.environ, {'CK_PRISM_HEDGE_AFTER': '0.5'}):
+            self.assertEqual(self.refresh_hedge_after({}), 0)
+            self.assertIsNone(self.refresh_hedge_after({'hedge_token_refresh': True}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_jwt  # noqa: E402
+from ck_prism.ck_errors import InvalidTokenError  # noqa: E402
+from fake_prism import FakePrismServer, FakeSigningKey, _b64url  # noqa: E402
+
+def segment(value):
+    return _b64url(json.dumps(value).encode('utf-8'))
+
+class VerifyAccessTokenTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+        cls.config = cls.server.profile_config(realm='tests')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.key = FakeSigningKey()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def claims(self, **overrides):
+        now = int(time.time())
+        claims = {
+            'iss': ck_jwt.get_issuer(self.config),
+            'aud': 'account',
+            'azp': self.config['client_id'],
+            'iat': now,
+            'exp': now + 900
+        }
+        claims.update(overrides)
+        return claims
+
+    def verify(self, token):
+        return ck_jwt.verify_access_token(self.config, token, self.directory)
+
+    def test_valid_token(self):
+        claims = self.verify(self.key.sign_jwt(self.claims()))
+        self.assertEqual(claims['azp'], self.config['client_id'])
+
+    def test_token_from_server(self):
+        token = self.server.issue_tokens('tests', self.config['client_id'])['access_token']
+        self.assertEqual(self.verify(token)['sub'], 'fake-user')
+
+    def test_tampered_signature(self):
+        header, body, signature = self.key.sign_jwt(self.claims()).split('.')
+        tampered = segment(self.claims(azp='someone-else'))
+        with self.assertRaisesRegex(InvalidTokenError, 'signature'):
+            self.verify(f'{header}.{tampered}.{signature}')
+
+    def test_wrong_kid(self):
+        token = FakeSigningKey(kid='unknown').sign_jwt(self.claims())
+        with self.assertRaisesRegex(InvalidTokenError, 'unknown key'):
+            self.verify(token)
+
+    def test_wrong_issuer(self):
+        token = self.key.sign_jwt(self.claims(iss='https://attacker.example/realms/tests'))
+        with self.assertRaisesRegex(InvalidTokenError, 'issued by'):
+            self.verify(token)
+
+    def test_wrong_client(self):
+        token = self.key.sign_jwt(self.claims(azp='other-client'))
+        with self.assertRaisesRegex(InvalidTokenError, 'client'):
+            self.verify(token)
+
+    def test_expired(self):
+        now = int(time.time())
+        token = self.key.sign_jwt(self.claims(iat=now - 7200, exp=now - 3600))
+        with self.assertRaisesRegex(InvalidTokenError, 'expired'):
+            self.verify(token)
+
+    def test_clock_skew_is_allowed(self):
+        now = int(time.time())
+        self.verify(self.key.sign_jwt(self.claims(iat=now + ck_jwt.CLOCK_SKEW - 5)))
+        with self.assertRaisesRegex(InvalidTokenError, 'not valid yet'):
+            self.verify(self.key.sign_jwt(self.claims(iat=now + ck_jwt.CLOCK_SKEW + 60)))
+
+    def test_alg_none(self):
+        token = f"{segment({'alg': 'none', 'typ': 'JWT'})}.{segment(self.claims())}."
+        with self.assertRaisesRegex(InvalidTokenError, 'algorithm'):
+            self.verify(token)
+
+    def test_non_object_segments(self):
+        claims = segment(self.claims())
+        header = segment({'alg': 'RS256', 'kid': self.key.kid})
+        for token in (f'{segment([])}.{claims}.c2ln', f'{header}.{segment("x")}.c2ln', f'{segment(1)}.{segment(None)}.c2ln'):
+            with self.assertRaisesRegex(InvalidTokenError, 'Malformed'):
+                self.verify(token)
+
+    def test_garbage(self):
+        for token in ('a.b.c', 'not-a-jwt', '..'):
+            with self.assertRaises(InvalidTokenError):
+                self.verify(token)
+
+if __name__ == '__main__':
+    unittest.main()
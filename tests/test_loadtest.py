@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_loadtest  # noqa: E402
+from ck_prism.ck_common import get_profile_config  # noqa: E402
+from ck_prism.ck_loadtest import LoadGenerator  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+class LoadGeneratorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakePrismServer().start()
+        cls.config = get_profile_config({'loadtest': cls.server.profile_config(realm='loadtest')}, 'loadtest')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def run_scenario(self, scenario, concurrency=2, iterations=6):
+        refresh_tokens = [self.server.issue_tokens()['refresh_token'] for _ in range(concurrency)]
+        generator = LoadGenerator(self.config, refresh_tokens, scenario)
+        return generator.run(concurrency, iterations=iterations)
+
+    def test_login_refreshes_then_exchanges(self):
+        report = self.run_scenario('login')
+
+        self.assertEqual(report['iterations'], 6)
+        for operation in ('refresh', 'exchange'):
+            self.assertEqual(report['operations'][operation]['succeeded'], 6)
+            self.assertEqual(report['operations'][operation]['failed'], 0)
+            self.assertIsNotNone(report['operations'][operation]['p95_ms'])
+
+    def test_refresh_only(self):
+        report = self.run_scenario('refresh')
+        self.assertEqual(list(report['operations']), ['refresh'])
+        self.assertEqual(report['operations']['refresh']['succeeded'], 6)
+
+    def test_exchange_reuses_one_access_token(self):
+        report = self.run_scenario('exchange')
+        self.assertEqual(list(report['operations']), ['exchange'])
+        self.assertEqual(report['operations']['exchange']['succeeded'], 6)
+
+    def test_rejected_refresh_token_is_counted(self):
+        generator = LoadGenerator(self.config, ['not-a-refresh-token'], 'login')
+        report = generator.run(1, iterations=3)
+
+        self.assertEqual(report['operations']['refresh']['errors'], {'HTTP 400': 3})
+        self.assertNotIn('exchange', report['operations'])
+
+    def test_non_json_response_is_an_error(self):
+        response = mock.Mock(status_code=200)
+        response.json.side_effect = ValueError('Expecting value')
+        generator = LoadGenerator(self.config, ['rt-token'], 'refresh')
+
+        with mock.patch.object(ck_loadtest.ck_http, 'post', return_value=response):
+            report = generator.run(1, iterations=2)
+
+        self.assertEqual(report['operations']['refresh']['errors'], {'Invalid response': 2})
+        self.assertEqual(report['operations']['refresh']['succeeded'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
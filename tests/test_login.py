@@ -0,0 +1,59 @@
+import io
+import os
+import sys
+import unittest
+import contextlib
+import urllib.parse
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_login  # noqa: E402
+from ck_prism.ck_errors import LoginRequiredError  # noqa: E402
+from ck_prism.ck_common import get_profile_config  # noqa: E402
+from fake_prism import FakePrismServer  # noqa: E402
+
+class SilentLoginTest(unittest.TestCase):
+    def setUp(self):
+        self.prompts = []
+
+    def login(self, sso_session, **settings):
+        """interactive_login against a fake Prism whose browser has (or lacks) an SSO session."""
+        with FakePrismServer(sso_session=sso_session) as server:
+            profile = dict(server.profile_config(realm='tests'), **settings)
+            with mock.patch.object(ck_login, 'open_browser', side_effect=self.follow_redirect), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                return ck_login.interactive_login(get_profile_config({'tests': profile}, 'tests'))
+
+    def follow_redirect(self, auth_url):
+        """Stand-in for the browser: follow the auth redirect to the callback server."""
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(auth_url).query))
+        self.prompts.append(query['prompt'])
+        requests.get(auth_url, timeout=10)
+        return True
+
+    def test_sso_session_logs_in_silently(self):
+        tokens = self.login(sso_session=True)
+
+        self.assertEqual(self.prompts, ['none'])
+        self.assertTrue(tokens['access_token'])
+
+    def test_login_required_falls_back_to_consent(self):
+        tokens = self.login(sso_session=False)
+
+        self.assertEqual(self.prompts, ['none', 'consent'])
+        self.assertTrue(tokens['access_token'])
+
+    def test_silent_only_raises_login_required(self):
+        with self.assertRaises(LoginRequiredError):
+            self.login(sso_session=False, login_prompt='none')
+        self.assertEqual(self.prompts, ['none'])
+
+    def test_consent_skips_the_silent_attempt(self):
+        self.login(sso_session=True, login_prompt='consent')
+        self.assertEqual(self.prompts, ['consent'])
+
+if __name__ == '__main__':
+    unittest.main()
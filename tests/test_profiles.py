@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism.ck_common import add_profile_arguments, select_profiles  # noqa: E402
+
+CONFIG = {'default': {}, 'staging': {}, 'production': {}}
+
+class SelectProfilesTest(unittest.TestCase):
+    def select(self, argv, default=None):
+        parser = argparse.ArgumentParser()
+        add_profile_arguments(parser, 'test', default=default)
+        return select_profiles(parser.parse_args(argv), CONFIG)
+
+    def test_profile(self):
+        self.assertEqual(self.select(['--profile', 'staging']), ['staging'])
+
+    def test_profiles(self):
+        self.assertEqual(self.select(['--profiles', ' staging, production,,']), ['staging', 'production'])
+
+    def test_all(self):
+        self.assertEqual(self.select(['--all'], default='default'), list(CONFIG))
+
+    def test_default(self):
+        self.assertEqual(self.select([], default='default'), ['default'])
+        self.assertEqual(self.select([]), list(CONFIG))
+
+    def test_options_are_exclusive(self):
+        with self.assertRaises(SystemExit):
+            self.select(['--profile', 'staging', '--all'])
+
+if __name__ == '__main__':
+    unittest.main()
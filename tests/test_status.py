@@ -0,0 +1,102 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_status  # noqa: E402
+from ck_prism.ck_store import STORE_ENV  # noqa: E402
+
+class StatusTest(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+        self.now = time.time()
+
+        ck_status.update_status_index(self.home, tokens={
+            'tests.json': {'expires_at': self.now - 60, 'refresh_expires_at': self.now + 3600}
+        }, profiles={
+            # Logged in, but no credentials written yet
+            'fresh': {'token': 'tests.json'},
+            'expired': {'token': 'tests.json', 'credentials_expire_at': self.now - 7200},
+            'valid': {'token': 'tests.json', 'credentials_expire_at': self.now + 1830}
+        })
+
+    def status(self, *argv):
+        """Run ``ck-prism status``; returns (exit status, stdout)."""
+        output = io.StringIO()
+        with mock.patch.object(sys, 'argv', ['ck-prism', 'status'] + list(argv)), \
+                mock.patch('ck_prism.ck_common.get_home_directory', return_value=self.home), \
+                contextlib.redirect_stdout(output):
+            try:
+                ck_status.status_utility()
+            except SystemExit as e:
+                return e.code, output.getvalue()
+        return 0, output.getvalue()
+
+    def test_json_rows(self):
+        status, output = self.status('--json')
+
+        self.assertEqual(status, 0)
+        rows = {row['profile']: row for row in json.loads(output)}
+        self.assertEqual(sorted(rows), ['expired', 'fresh', 'valid'])
+        self.assertEqual(rows['fresh']['credentials_expire_at'], None)
+        self.assertFalse(rows['fresh']['credentials_valid'])
+        self.assertFalse(rows['expired']['credentials_valid'])
+        self.assertTrue(rows['valid']['credentials_valid'])
+        self.assertEqual(rows['expired']['token_expires_at'], self.now - 60)
+        self.assertEqual(rows['expired']['refresh_expires_at'], self.now + 3600)
+
+    def test_profile_without_expiration(self):
+        status, output = self.status('--profile', 'fresh', '--json')
+
+        self.assertEqual(status, 1)
+        [row] = json.loads(output)
+        self.assertEqual((row['profile'], row['credentials_valid']), ('fresh', False))
+
+    def test_expired_profile(self):
+        status, output = self.status('--profile', 'expired')
+
+        self.assertEqual(status, 1)
+        self.assertIn('expired 2h00m ago', output)
+
+    def test_valid_profile(self):
+        status, output = self.status('--profile', 'valid')
+
+        self.assertEqual(status, 0)
+        self.assertIn('in 30m', output)
+
+    def test_table_marks_missing_expiration(self):
+        _, output = self.status()
+
+        [fresh] = [line for line in output.splitlines() if line.startswith('fresh ')]
+        self.assertEqual(fresh.split()[-1], '-')
+
+    def test_unknown_profile(self):
+        status, output = self.status('--profile', 'other')
+
+        self.assertEqual(status, 1)
+        self.assertIn('No status recorded for profile other', output)
+
+    def test_index_updates_merge(self):
+        ck_status.update_status_index(self.home, profiles={'fresh': {'credentials_expire_at': self.now + 60}})
+
+        entry = ck_status.load_status_index(self.home)['profiles']['fresh']
+        self.assertEqual(entry, {'token': 'tests.json', 'credentials_expire_at': self.now + 60})
+
+class SqliteStatusTest(StatusTest):
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {STORE_ENV: 'sqlite'})
+        environment.start()
+        self.addCleanup(environment.stop)
+        super().setUp()
+
+if __name__ == '__main__':
+    unittest.main()
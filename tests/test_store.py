@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_store  # noqa: E402
+
+class SqliteStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(ck_store.get_config_dir(self.directory))
+        with open(ck_store.get_config_path(self.directory), 'w') as f:
+            json.dump({'default': {'realm': 'tests'}}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_imports_json_once(self):
+        self.assertEqual(ck_store.SqliteStore(self.directory).get_profile('default'), {'realm': 'tests'})
+
+        with open(ck_store.get_config_path(self.directory), 'w') as f:
+            json.dump({'later': {'realm': 'tests'}}, f)
+        self.assertIsNone(ck_store.SqliteStore(self.directory).get_profile('later'))
+
+    def test_open_does_not_wait_for_writers(self):
+        ck_store.SqliteStore(self.directory)
+
+        writer = sqlite3.connect(ck_store.get_database_path(self.directory), isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute("INSERT INTO profiles (name, data) VALUES ('pending', '{}')")
+        try:
+            start = time.monotonic()
+            store = ck_store.SqliteStore(self.directory)
+            profiles = store.profiles()
+            self.assertEqual(dict(profiles.items()), {'default': {'realm': 'tests'}})
+            self.assertLess(time.monotonic() - start, 1)
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
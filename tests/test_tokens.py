@@ -0,0 +1,42 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_login  # noqa: E402
+
+class TokenFileTest(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def config(self, keycloak_base_url='https://login.prism.cloudkeeper.com', realm='acme'):
+        return {'keycloak_base_url': keycloak_base_url, 'realm': realm, 'client_id': 'ckauth-cli'}
+
+    def test_keyed_by_login_server(self):
+        files = {ck_login.get_token_file(self.config(url), self.home)
+                 for url in ('https://login.prism.cloudkeeper.com', 'http://127.0.0.1:8080', 'http://127.0.0.1:8081')}
+        self.assertEqual(len(files), 3)
+        self.assertIn('login.prism.cloudkeeper.com_acme_ckauth-cli',
+                      ck_login.get_token_file(self.config(), self.home))
+
+    def test_profile_token_file_is_migrated(self):
+        token_file = ck_login.get_token_file(self.config(), self.home)
+        legacy_file = os.path.join(self.home, '.ck-prism', 'tokens', 'production_tokens.json')
+        os.makedirs(os.path.dirname(legacy_file))
+        with open(legacy_file, 'w') as f:
+            json.dump({'access_token': 'a', 'refresh_token': 'r', 'expires_at': 1}, f)
+
+        ck_login.migrate_profile_tokens(token_file, self.home, 'production')
+
+        self.assertFalse(os.path.exists(legacy_file))
+        self.assertEqual(ck_login.load_tokens(token_file)['refresh_token'], 'r')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import heapq
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ck_prism import ck_watch  # noqa: E402
+from ck_prism.ck_errors import ApiError  # noqa: E402
+from ck_prism.ck_common import format_expiration  # noqa: E402
+from ck_prism.ck_watch import RefreshScheduler, MIN_INTERVAL, MAX_RETRY_DELAY  # noqa: E402
+
+CONFIG = {name: {'realm': 'tests', 'client_id': 'ckauth-cli', 'region': 'eu-west-1', 'role_arn': f'arn:{name}'}
+          for name in ('a', 'b', 'c')}
+
+def credentials(expires_in):
+    return ('ASIA', 'secret', 'token', format_expiration(time.time() + expires_in))
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.exchange = mock.Mock(return_value=({}, []))
+        self.write = mock.Mock()
+        patches = [
+            mock.patch.object(ck_watch, 'exchange_profiles', self.exchange),
+            mock.patch.object(ck_watch, 'write_aws_credentials_batch', self.write),
+            mock.patch.object(ck_watch, 'log'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scheduler = RefreshScheduler(CONFIG, [], '/nonexistent', refresh_before=600, jitter=120)
+
+    def queue_at(self, **offsets):
+        now = time.time()
+        self.scheduler.queue = [(now + offset, profile) for profile, offset in offsets.items()]
+        heapq.heapify(self.scheduler.queue)
+
+    def scheduled(self, profile):
+        return [when for when, name in self.scheduler.queue if name == profile]
+
+    def test_only_due_profiles_are_refreshed_in_order(self):
+        self.queue_at(a=-5, b=-10, c=300)
+
+        self.scheduler.run_due()
+
+        self.assertEqual(self.exchange.call_args[0][1], ['b', 'a'])
+        self.assertEqual([name for _, name in self.scheduler.queue if name == 'c'], ['c'])
+
+    def test_nothing_due_makes_no_request(self):
+        self.queue_at(a=300)
+        self.scheduler.run_due()
+        self.exchange.assert_not_called()
+
+    def test_refreshed_profile_is_rescheduled_before_expiry(self):
+        self.queue_at(a=-1)
+        self.exchange.return_value = ({'a': credentials(3600)}, [])
+
+        self.scheduler.run_due()
+
+        self.write.assert_called_once_with([('a', self.exchange.return_value[0]['a'], 'eu-west-1')], '/nonexistent')
+        [when] = self.scheduled('a')
+        self.assertGreaterEqual(when, time.time() + 3600 - 600 - 120 - 5)
+        self.assertLessEqual(when, time.time() + 3600 - 600)
+
+    def test_short_lived_credentials_wait_at_least_min_interval(self):
+        self.queue_at(a=-1)
+        self.exchange.return_value = ({'a': credentials(30)}, [])
+
+        self.scheduler.run_due()
+
+        [when] = self.scheduled('a')
+        self.assertGreaterEqual(when, time.time() + MIN_INTERVAL - 5)
+
+    def test_failures_back_off_exponentially(self):
+        self.exchange.return_value = ({}, ['a'])
+        for failures in (1, 2, 3):
+            self.queue_at(a=-1)
+            self.scheduler.run_due()
+
+            retry_in = MIN_INTERVAL * 2 ** (failures - 1)
+            [when] = self.scheduled('a')
+            self.assertEqual(self.scheduler.failures['a'], failures)
+            self.assertGreaterEqual(when, time.time() + retry_in / 2 - 5)
+            self.assertLessEqual(when, time.time() + retry_in)
+
+    def test_backoff_is_capped(self):
+        self.scheduler.failures['a'] = 20
+        self.exchange.return_value = ({}, ['a'])
+        self.queue_at(a=-1)
+
+        self.scheduler.run_due()
+
+        [when] = self.scheduled('a')
+        self.assertLessEqual(when, time.time() + MAX_RETRY_DELAY)
+
+    def test_success_resets_the_backoff(self):
+        self.scheduler.failures['a'] = 3
+        self.exchange.return_value = ({'a': credentials(3600)}, [])
+        self.queue_at(a=-1)
+
+        self.scheduler.run_due()
+
+        self.assertNotIn('a', self.scheduler.failures)
+
+    def test_exchange_error_fails_every_due_profile(self):
+        self.exchange.side_effect = ApiError('Prism is down')
+        self.queue_at(a=-1, b=-1)
+
+        self.scheduler.run_due()
+
+        self.assertEqual(self.scheduler.failures, {'a': 1, 'b': 1})
+        self.assertEqual(len(self.scheduler.queue), 2)
+
+    def test_write_error_fails_the_refreshed_profiles(self):
+        self.exchange.return_value = ({'a': credentials(3600)}, [])
+        self.write.side_effect = OSError('disk full')
+        self.queue_at(a=-1)
+
+        self.scheduler.run_due()
+
+        self.assertEqual(self.scheduler.failures, {'a': 1})
+        [when] = self.scheduled('a')
+        self.assertLessEqual(when, time.time() + MIN_INTERVAL)
+
+if __name__ == '__main__':
+    unittest.main()